@@ -0,0 +1,18 @@
+from django.urls import path
+from blog import async_views, views
+
+urlpatterns = [
+    path('token/', views.token, name='token'),
+    path('signup/', views.signup, name='signup'),
+    path('signin/', views.signin, name='signin'),
+    path('signout/', views.signout, name='signout'),
+    path('article/', async_views.article, name='article'),
+    path('article/bulk/', async_views.article_bulk, name='article_bulk'),
+    path('article/search/', async_views.article_search, name='article_search'),
+    path('article/<int:article_id>/', async_views.article_id, name='article_id'),
+    path('article/<int:article_id>/comment/', async_views.article_id_comment, name='article_id_comment'),
+    path('comment/bulk/', async_views.comment_bulk, name='comment_bulk'),
+    path('comment/<int:comment_id>/', async_views.comment_id, name='comment_id'),
+    path('user/<int:user_id>/article/', async_views.user_article, name='user_article'),
+    path('user/<int:user_id>/comment/', async_views.user_comment, name='user_comment'),
+]
@@ -0,0 +1,52 @@
+"""
+ASGI-native variants of the article and comment endpoints.
+
+Django 3.1 has no async ORM, and under ASGI it runs every sync view in one
+shared thread (thread_sensitive=True), so the whole server answers a single
+request at a time. These views run the view body - session and user lookups
+included - in the default executor instead (thread_sensitive=False): requests
+are answered concurrently, each DB connection belongs to one worker thread and
+is released there when the request is done.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from . import views
+
+
+def _in_worker(fn):
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if response.streaming:
+        # Django 3.1 iterates streaming bodies in the event loop, where the ORM
+        # is off limits: encode it here. Use the WSGI deployment for exports.
+        response.streaming_content = [b''.join(response.streaming_content)]
+    return response
+
+
+def async_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # session and user lookups happen in the worker too, when the view reads request.user
+        return await _in_worker(_render)(view, request, *args, **kwargs)
+    return wrapper
+
+article = async_view(views.article)
+article_search = async_view(views.article_search)
+article_id = async_view(views.article_id)
+article_id_comment = async_view(views.article_id_comment)
+comment_id = async_view(views.comment_id)
+article_bulk = async_view(views.article_bulk)
+comment_bulk = async_view(views.comment_bulk)
+user_article = async_view(views.user_article)
+user_comment = async_view(views.user_comment)
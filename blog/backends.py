@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from .cache import blog_cache
+
+
+def user_key(user_id):
+    return 'blog:user:{}'.format(user_id)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user() - run on every authenticated request - is
+    served from the blog cache for BLOG_USER_CACHE_TIMEOUT seconds. Entries are
+    dropped when the user is saved or deleted (blog.signals); elsewhere (other
+    processes with a local cache) a change shows within the timeout.
+    """
+
+    def get_user(self, user_id):
+        cache = blog_cache()
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.BLOG_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+def invalidate_user(user_id):
+    blog_cache().delete(user_key(user_id))
@@ -0,0 +1,79 @@
+"""
+Benchmark scenarios for ``python manage.py bench <scenario>``.
+
+Every scenario runs against a scratch copy of the ``default`` database (created
+the way the test runner creates its test database), so the configured backend
+- SQLite or PostgreSQL - is what gets measured and real data is never touched.
+"""
+from contextlib import contextmanager
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from blog.models import Article, Comment
+from blog.threads import fill_root_paths
+
+
+@contextmanager
+def scratch_database(name=None):
+    # ``name`` overrides the test database name, e.g. a file instead of SQLite's in-memory default
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed(users=10, articles=1000, comments=0, batch_size=5000):
+    """
+    Bulk-insert users, articles and top-level comments (paths filled in);
+    articles and comments are spread round-robin over users and articles.
+    Returns the created user and article ids.
+    """
+    User.objects.bulk_create(User(username='bench{}'.format(i)) for i in range(users))
+    user_ids = list(User.objects.filter(username__startswith='bench').values_list('id', flat=True))
+
+    for start in range(0, articles, batch_size):
+        Article.objects.bulk_create(
+            Article(title='title{}'.format(i), content='content ' * 20, author_id=user_ids[i % users])
+            for i in range(start, min(start + batch_size, articles))
+        )
+    article_ids = list(Article.objects.values_list('id', flat=True))
+
+    for start in range(0, comments, batch_size):
+        Comment.objects.bulk_create(
+            Comment(article_id=article_ids[i % articles], content='comment ' * 5, author_id=user_ids[i % users])
+            for i in range(start, min(start + batch_size, comments))
+        )
+    if comments:
+        fill_root_paths(article_ids)
+    return user_ids, article_ids
+
+
+def measure(fn, repeat):
+    # wall time of each call, in milliseconds
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    return {
+        'n': len(samples),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
@@ -0,0 +1,109 @@
+"""
+Throughput and latency of one endpoint served in-process three ways: the WSGI
+handler on a thread pool, the ASGI handler with the sync views (Django 3.1 runs
+them all in one thread) and the ASGI handler with blog.async_views.
+
+There are no sockets involved: this measures the handlers and the views, not
+a server's connection handling; run a real load generator (e.g. wrk against
+uvicorn and gunicorn) for keep-alive connection counts.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import time
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client, override_settings
+
+from . import scratch_database, seed, summarize
+
+help = 'requests/sec and latency of the WSGI, ASGI and ASGI + async views handlers'
+
+MODES = {
+    # mode: (handler, URLconf)
+    'wsgi': ('wsgi', 'blog.urls'),
+    'asgi': ('asgi', 'blog.urls'),
+    'asgi_async_views': ('asgi', 'blog.async_urls'),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--path', default='/article/1/comment/')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=32, help='WSGI worker threads')
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--mode', choices=list(MODES), action='append')
+
+
+def _run_wsgi(path, query_string, cookie, requests, threads):
+    handler = WSGIHandler()
+
+    def call(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query_string, 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_COOKIE': cookie, 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': BytesIO(),
+        }
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: None)
+        b''.join(response)
+        response.close()
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(call, range(requests)))
+
+
+def _run_asgi(path, query_string, cookie, requests, concurrency):
+    handler = ASGIHandler()
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    async def call(slots):
+        async with slots:
+            start = time.perf_counter()
+            await handler(dict(scope), receive, send)
+            return (time.perf_counter() - start) * 1000
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*[call(slots) for _ in range(requests)])
+
+    return asyncio.run(main())
+
+
+def run(options):
+    path, _, query_string = options['path'].partition('?')
+    with scratch_database():
+        seed(users=10, articles=100, comments=options['comments'])
+        client = Client()
+        client.force_login(User.objects.first())
+        cookie = 'sessionid={}'.format(client.cookies['sessionid'].value)
+
+        results = []
+        for mode in options['mode'] or list(MODES):
+            handler, urlconf = MODES[mode]
+            with override_settings(ROOT_URLCONF=urlconf):
+                start = time.perf_counter()
+                if handler == 'wsgi':
+                    samples = _run_wsgi(path, query_string, cookie, options['requests'], options['threads'])
+                else:
+                    samples = _run_asgi(path, query_string, cookie, options['requests'], options['concurrency'])
+                elapsed = time.perf_counter() - start
+            row = {'mode': mode, 'rps': round(len(samples) / elapsed, 1)}
+            row.update(summarize(samples))
+            results.append(row)
+        return results
@@ -0,0 +1,70 @@
+"""
+Authentication cost: PBKDF2 verification at several iteration counts (the
+sign-in path), and the per-request session + user resolution of the stock
+configuration (database sessions, ModelBackend), the default one (database
+sessions, blog.backends.CachedModelBackend) and the one with a shared session
+cache (cached_db sessions; this process's cache stands in for memcached, so
+its timings leave out the network round trip).
+"""
+from importlib import import_module
+
+from django.contrib.auth import get_user
+from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpRequest
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import measure, scratch_database, seed, summarize
+
+help = 'password hashing cost and per-request session/user resolution overhead'
+
+CONFIGURATIONS = {
+    'stock': {'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+              'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend']},
+    'default': {'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+                'AUTHENTICATION_BACKENDS': ['blog.backends.CachedModelBackend']},
+    'session_cache': {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+                      'AUTHENTICATION_BACKENDS': ['blog.backends.CachedModelBackend']},
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--iterations', type=int, nargs='+', default=[216000, 100000, 20000])
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--hash-repeat', type=int, default=10)
+
+
+def run(options):
+    results = []
+    for iterations in options['iterations']:
+        with override_settings(BLOG_PASSWORD_ITERATIONS=iterations):
+            encoded = make_password('password')
+            row = {'measure': 'check_password', 'config': '{} iterations'.format(iterations), 'queries': 0}
+            row.update(summarize(measure(lambda: check_password('password', encoded), options['hash_repeat'])))
+            results.append(row)
+
+    with scratch_database():
+        seed(users=1, articles=0)
+        for name, config in CONFIGURATIONS.items():
+            with override_settings(**config):
+                caches['default'].clear()
+                client = Client()
+                client.force_login(User.objects.first())
+                session_key = client.cookies['sessionid'].value
+                engine = import_module(config['SESSION_ENGINE'])
+
+                def resolve():
+                    request = HttpRequest()
+                    request.session = engine.SessionStore(session_key)
+                    assert get_user(request).is_authenticated
+
+                resolve()  # warm up
+                with CaptureQueriesContext(connection) as queries:
+                    resolve()
+                row = {'measure': 'session + user', 'config': name, 'queries': len(queries)}
+                row.update(summarize(measure(resolve, options['repeat'])))
+                results.append(row)
+    return results
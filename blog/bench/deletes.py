@@ -0,0 +1,81 @@
+"""
+Latency of deleting one article against the size of its comment thread, with
+Django's Collector (QuerySet.delete()), with blog.deletion.delete_articles
+(set-based) and with blog.deletion.purge (chunked). Besides wall time, each
+row gives the longest single DELETE statement - how long other writers wait
+for the write lock - and the peak Python memory of the delete.
+"""
+import time
+import tracemalloc
+
+from django.db import connection
+
+from blog import deletion
+from blog.models import Article, Comment
+
+from . import scratch_database, seed
+
+help = 'delete latency, longest DELETE and memory against comment thread size'
+
+METHODS = {
+    'collector': lambda article_id: Article.objects.filter(id=article_id).delete(),
+    'set-based': lambda article_id: deletion.delete_articles(Article.objects.filter(id=article_id)),
+    'chunked': deletion.purge,
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--comments', type=int, action='append',
+                        help='comments of the deleted article (default: 1000, 10000, 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='deletes per method and thread size')
+
+
+class _LongestDelete:
+    # execute wrapper keeping the duration of the longest DELETE statement
+    def __init__(self):
+        self.ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if sql.startswith('DELETE'):
+                self.ms = max(self.ms, (time.perf_counter() - start) * 1000)
+
+
+def _thread(author_id, comments, batch_size=5000):
+    article = Article.objects.create(title='title', content='content ' * 20, author_id=author_id)
+    for start in range(0, comments, batch_size):
+        Comment.objects.bulk_create(Comment(article_id=article.id, content='comment ' * 5, author_id=author_id)
+                                    for _ in range(start, min(start + batch_size, comments)))
+    return article.id
+
+
+def run(options):
+    results = []
+    with scratch_database():
+        user_ids, _ = seed(users=1, articles=0)
+        for comments in options['comments'] or [1000, 10000, 100000]:
+            for method, delete in METHODS.items():
+                samples, longest = [], _LongestDelete()
+                for _ in range(options['repeat']):
+                    article_id = _thread(user_ids[0], comments)
+                    start = time.perf_counter()
+                    with connection.execute_wrapper(longest):
+                        delete(article_id)
+                    samples.append((time.perf_counter() - start) * 1000)
+                # memory on a run of its own: tracemalloc slows Python down
+                article_id = _thread(user_ids[0], comments)
+                tracemalloc.start()
+                delete(article_id)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                results.append({
+                    'method': method,
+                    'comments': comments,
+                    'mean_ms': round(sum(samples) / len(samples), 1),
+                    'longest_delete_ms': round(longest.ms, 1),
+                    'peak_kib': round(peak / 1024),
+                })
+    return results
@@ -0,0 +1,72 @@
+"""
+Listing and ownership-check latency with the composite (fk, id) indexes of
+0002_indexes against the single-column FK indexes they replaced.
+"""
+import random
+
+from django.db import connection, models
+
+from blog.models import Article, Comment
+from . import measure, scratch_database, seed, summarize
+
+help = 'listing / ownership-check latency with and without the composite indexes'
+
+# the schema before 0002_indexes: one implicit index per foreign key
+FK_INDEXES = [
+    (Article, models.Index(fields=['author'], name='bench_article_author_idx')),
+    (Comment, models.Index(fields=['article'], name='bench_comment_article_idx')),
+    (Comment, models.Index(fields=['author'], name='bench_comment_author_idx')),
+]
+
+
+def add_arguments(parser):
+    parser.add_argument('--comments', type=int, default=10 ** 6)
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+
+
+def _swap_indexes(composite):
+    with connection.schema_editor() as editor:
+        for model in (Article, Comment):
+            for index in model._meta.indexes:
+                (editor.add_index if composite else editor.remove_index)(model, index)
+        for model, index in FK_INDEXES:
+            (editor.remove_index if composite else editor.add_index)(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def run(options):
+    rng = random.Random(0)
+    with scratch_database():
+        user_ids, article_ids = seed(options['users'], options['articles'], options['comments'])
+        comment_ids = list(Comment.objects.values_list('id', flat=True))
+        limit = options['limit']
+
+        queries = {
+            # a middle page of one article's comments (keyset on id)
+            'comment_listing': lambda: list(
+                Comment.objects.filter(article_id=rng.choice(article_ids), id__gt=rng.choice(comment_ids) // 2)
+                .order_by('id').values_list('content', 'author_id')[:limit]),
+            'article_listing_by_author': lambda: list(
+                Article.objects.filter(author_id=rng.choice(user_ids))
+                .order_by('id').values_list('title', 'author_id')[:limit]),
+            'comment_listing_by_author': lambda: list(
+                Comment.objects.filter(author_id=rng.choice(user_ids))
+                .order_by('id').values_list('content', 'article_id')[:limit]),
+            # the 403/404 probe of a conditional write
+            'comment_ownership_check': lambda: Comment.objects.filter(
+                id=rng.choice(comment_ids), author_id=rng.choice(user_ids)).exists(),
+        }
+
+        results = []
+        for composite in (False, True):
+            _swap_indexes(composite)
+            for name, query in queries.items():
+                query()  # warm up
+                row = {'indexes': 'composite' if composite else 'fk', 'query': name}
+                row.update(summarize(measure(query, options['repeat'])))
+                results.append(row)
+        return results
@@ -0,0 +1,239 @@
+"""
+A read/write mix replayed against the signed-in API, reporting per endpoint
+the request rate, latency percentiles and queries per request.
+
+In-process (the default), requests go through django.test.Client against a
+scratch database seeded with bulk inserts, one at a time, and every request's
+queries are counted. With --server URL they go over HTTP to a running server
+(e.g. ``manage.py runserver`` or uvicorn), which is first seeded through the
+signup and bulk endpoints; --concurrency clients then share the mix, and
+queries cannot be counted from the outside.
+
+Rate limits would turn most of a run into 429s: they are off in-process, and
+a server under test should run with BLOG_RATE_LIMITING=0. Refused requests
+are counted apart (throttled) and left out of the latencies.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+import json
+import random
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Article, Comment
+from . import scratch_database, seed, summarize
+
+help = 'requests/sec, latency and queries per request of a read/write mix over the API'
+
+# endpoint: (weight, method, path template, request body builder)
+MIX = {
+    'article_page': (25, 'GET', '/api/article/?limit=20', None),
+    'article_id': (25, 'GET', '/api/article/{article}/', None),
+    'article_id_comment': (20, 'GET', '/api/article/{article}/comment/', None),
+    'comment_id': (5, 'GET', '/api/comment/{comment}/', None),
+    'user_article': (5, 'GET', '/api/user/{user}/article/', None),
+    'article_search': (5, 'GET', '/api/article/search/?q=title{article}', None),
+    'article_post': (3, 'POST', '/api/article/', lambda rng: {'title': 'bench', 'content': 'bench ' * 20}),
+    'article_put': (2, 'PUT', '/api/article/{own_article}/', lambda rng: {'title': 'edited', 'content': 'edited'}),
+    'comment_post': (8, 'POST', '/api/article/{article}/comment/', lambda rng: {'content': 'bench comment'}),
+    'comment_put': (2, 'PUT', '/api/comment/{own_comment}/', lambda rng: {'content': 'edited'}),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--endpoint', choices=list(MIX), action='append',
+                        help='only replay these endpoints (default: the whole mix)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the mix')
+    parser.add_argument('--server', help='base URL of a running server, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=1, help='concurrent clients (--server only)')
+
+
+class InProcessClient:
+    """django.test.Client signed in as ``user``; counts each request's queries."""
+
+    def __init__(self, user):
+        self.client = Client(SERVER_NAME='localhost')
+        self.client.force_login(user)
+
+    def request(self, method, path, data):
+        with CaptureQueriesContext(connection) as queries:
+            if data is None:
+                response = getattr(self.client, method.lower())(path)
+            else:
+                response = getattr(self.client, method.lower())(path, json.dumps(data),
+                                                                content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code, response.content if not response.streaming else b'', len(queries)
+
+
+class HTTPClient:
+    """An HTTP session (cookies and CSRF token) against ``base_url``; sessions can share ``cookies``."""
+
+    def __init__(self, base_url, cookies=None):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar() if cookies is None else cookies
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        if cookies is None:
+            self.request('GET', '/api/token/', None)
+
+    def request(self, method, path, data):
+        csrftoken = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        request = Request(self.base_url + path, method=method, headers={'X-CSRFToken': csrftoken},
+                          data=None if data is None else json.dumps(data).encode())
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read(), None
+        except HTTPError as e:
+            return e.code, e.read(), None
+
+    def signin(self, username, password):
+        credentials = {'username': username, 'password': password}
+        self.request('POST', '/api/signup/', credentials)
+        status, body, queries = self.request('POST', '/api/signin/', credentials)
+        if status != 204:
+            raise RuntimeError('cannot sign in to {} ({})'.format(self.base_url, status))
+
+
+def _seed_in_process(options):
+    user_ids, article_ids = seed(options['users'], options['articles'], options['comments'])
+    user = User.objects.get(id=user_ids[0])
+    return InProcessClient(user), {
+        'user': user_ids,
+        'article': article_ids,
+        'comment': list(Comment.objects.values_list('id', flat=True)),
+        'own_article': list(Article.objects.filter(author=user).values_list('id', flat=True)),
+        'own_comment': list(Comment.objects.filter(author=user).values_list('id', flat=True)),
+    }
+
+
+def _seed_server(options):
+    # users sign up and post their share of rows in batches through the bulk endpoints
+    prefix, batch = 'bench-{}'.format(uuid.uuid4().hex[:8]), settings.BLOG_BULK_MAX_ITEMS
+    clients = []
+    for i in range(options['users']):
+        client = HTTPClient(options['server'])
+        client.signin('{}-{}'.format(prefix, i), prefix)
+        clients.append(client)
+
+    def post_bulk(client, path, items):
+        ids = []
+        for start in range(0, len(items), batch):
+            status, body, queries = client.request('POST', path, items[start:start + batch])
+            ids += [result['id'] for result in json.loads(body)]
+        return ids
+
+    shares = [range(i, options['articles'], len(clients)) for i in range(len(clients))]
+    own = [post_bulk(client, '/api/article/bulk/', [{'title': 'title{}'.format(n), 'content': 'content ' * 20}
+                                                    for n in share]) for client, share in zip(clients, shares)]
+    article_ids = sorted(pk for ids in own for pk in ids)
+    shares = [range(i, options['comments'], len(clients)) for i in range(len(clients))]
+    own_comments = [post_bulk(client, '/api/comment/bulk/', [{'article': article_ids[n % len(article_ids)],
+                                                              'content': 'comment ' * 5} for n in share])
+                    for client, share in zip(clients, shares)]
+
+    user_ids = [json.loads(clients[0].request('GET', '/api/article/{}/'.format(ids[0]), None)[1])['author']
+                for ids in own if ids]
+    return clients[0], {
+        'user': user_ids,
+        'article': article_ids,
+        'comment': sorted(pk for ids in own_comments for pk in ids),
+        'own_article': own[0],
+        'own_comment': own_comments[0],
+    }
+
+
+def _requests(options, ids):
+    # the (endpoint, method, path, body) of every request, drawn up front
+    rng = random.Random(options['seed'])
+    endpoints = options['endpoint'] or list(MIX)
+    weights = [MIX[endpoint][0] for endpoint in endpoints]
+    requests = []
+    for endpoint in rng.choices(endpoints, weights, k=options['requests']):
+        weight, method, template, body = MIX[endpoint]
+        path = template.format(**{key: rng.choice(values) for key, values in ids.items() if values})
+        requests.append((endpoint, method, path, body(rng) if body else None))
+    return requests
+
+
+def _replay(clients, requests):
+    # [(endpoint, milliseconds, status, queries)], clients taking requests in turn
+    lock, position, samples = threading.Lock(), iter(requests), []
+
+    def work(client):
+        while True:
+            with lock:
+                request = next(position, None)
+            if request is None:
+                return
+            endpoint, method, path, data = request
+            start = time.perf_counter()
+            status, body, queries = client.request(method, path, data)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                samples.append((endpoint, elapsed, status, queries))
+
+    if len(clients) == 1:
+        work(clients[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+            list(pool.map(work, clients))
+    return samples
+
+
+def _row(endpoint, samples, elapsed):
+    throttled = sum(1 for sample in samples if sample[2] == 429)
+    samples = [sample for sample in samples if sample[2] != 429]
+    latencies = [ms for endpoint_, ms, status, queries in samples]
+    queries = [queries for endpoint_, ms, status, queries in samples if queries is not None]
+    row = {'endpoint': endpoint, 'rps': round(len(samples) / elapsed, 1)}
+    # every request refused: no latencies to summarize
+    row.update(summarize(latencies) if latencies else
+               {'n': 0, 'mean_ms': None, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None})
+    row['queries'] = round(sum(queries) / len(queries), 2) if queries else None
+    row['errors'] = sum(1 for sample in samples if sample[2] >= 400)
+    row['throttled'] = throttled
+    return row
+
+
+def _report(samples, elapsed):
+    # per endpoint, rps is its share of the run's throughput
+    rows = [_row(endpoint, [sample for sample in samples if sample[0] == endpoint], elapsed)
+            for endpoint in MIX if any(sample[0] == endpoint for sample in samples)]
+    return rows + [_row('all', samples, elapsed)]
+
+
+def _run(clients, ids, options):
+    requests = _requests(options, ids)
+    start = time.perf_counter()
+    samples = _replay(clients, requests)
+    return _report(samples, time.perf_counter() - start)
+
+
+def run(options):
+    if options['server']:
+        client, ids = _seed_server(options)
+        clients = [client] + [HTTPClient(options['server'], client.cookies)
+                              for _ in range(options['concurrency'] - 1)]
+        return _run(clients, ids, options)
+
+    with scratch_database(), override_settings(BLOG_RATE_LIMITS={}):
+        client, ids = _seed_in_process(options)
+        # warm the session and user caches
+        client.request('GET', '/api/article/{}/'.format(ids['article'][0]), None)
+        return _run([client], ids, options)
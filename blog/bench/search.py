@@ -0,0 +1,52 @@
+"""
+Latency of GET /api/article/search/ queries (blog.search) over a corpus of
+articles made of random words from a Zipf-like vocabulary.
+"""
+import random
+
+from django.contrib.auth.models import User
+
+from blog.models import Article
+from blog.search import search_articles
+from blog.serializers import ARTICLE_ENTRY
+from . import measure, scratch_database, summarize
+
+help = 'full-text search latency over a synthetic article corpus'
+
+
+def add_arguments(parser):
+    parser.add_argument('--articles', type=int, default=10 ** 6)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    parser.add_argument('--words', type=int, default=80, help='words per article')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=5000)
+
+
+def run(options):
+    rng = random.Random(0)
+    vocabulary = ['w{}'.format(i) for i in range(options['vocabulary'])]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def text(n):
+        return ' '.join(rng.choices(vocabulary, weights, k=n))
+
+    with scratch_database():
+        author = User.objects.create(username='bench')
+        for start in range(0, options['articles'], options['batch_size']):
+            Article.objects.bulk_create(
+                Article(title=text(6), content=text(options['words']), author=author)
+                for _ in range(min(options['batch_size'], options['articles'] - start))
+            )
+
+        queries = {
+            'rare word': lambda: vocabulary[rng.randrange(len(vocabulary) // 2, len(vocabulary))],
+            'common word': lambda: vocabulary[rng.randrange(10, 100)],
+            'two words': lambda: '{} {}'.format(vocabulary[rng.randrange(10, 1000)], vocabulary[rng.randrange(10, 1000)]),
+        }
+        results = []
+        for name, query in queries.items():
+            row = {'query': name, 'articles': options['articles']}
+            row.update(summarize(measure(
+                lambda: search_articles(query(), ARTICLE_ENTRY.columns, 21, 0), options['repeat'])))
+            results.append(row)
+        return results
@@ -0,0 +1,52 @@
+"""
+Encode time and peak allocations of an article listing: the per-view dicts and
+JsonResponse this API used to build, against the declared ARTICLE schema on
+every available JSON backend. Rows are synthesized; no database is involved.
+"""
+import json
+import time
+import tracemalloc
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from blog.serializers import ARTICLE, BACKENDS
+
+help = 'encode time and allocations of a listing, dicts + JsonResponse vs schema encoders'
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--content-length', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def _json_response(rows):
+    article_list = [{'title': title, 'content': content, 'author': author} for title, content, author in rows]
+    return json.dumps(article_list, cls=DjangoJSONEncoder).encode()
+
+
+def run(options):
+    content = ('lorem ipsum dölor ' * options['content_length'])[:options['content_length']]
+    rows = [('title {}'.format(i), content, i % 1000) for i in range(options['rows'])]
+
+    encoders = [('dicts + JsonResponse', _json_response)]
+    encoders += [('schema ({})'.format(backend.name), lambda rows, backend=backend: backend.encode_rows(ARTICLE, rows))
+                 for backend in BACKENDS]
+
+    results = []
+    for name, encode in encoders:
+        samples = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            body = encode(rows)
+            samples.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        encode(rows)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({'encoder': name, 'rows': len(rows), 'bytes': len(body),
+                        'best_ms': round(min(samples), 2), 'median_ms': round(sorted(samples)[len(samples) // 2], 2),
+                        'peak_alloc_kb': peak // 1024})
+    return results
@@ -0,0 +1,92 @@
+"""
+Thread and subtree fetches on one article with a large reply tree: pages in
+thread order through the (article, path) index (blog.threads), against the
+level-by-level parent_id queries an adjacency list needs for the same subtrees.
+"""
+import random
+
+from blog.models import Comment
+from blog.pagination import encode_cursor
+from blog.serializers import THREAD_ENTRY
+from blog.threads import paginate_thread, reply_path, subtree
+
+from . import measure, scratch_database, seed, summarize
+
+help = 'thread page / subtree latency: materialized paths against per-level queries'
+
+
+def add_arguments(parser):
+    parser.add_argument('--comments', type=int, default=50000, help='comments of the article')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--depth', type=int, default=3, help='levels of the depth-limited subtrees')
+
+
+def _tree(article_id, author_id, comments, rng, batch_size=5000):
+    """
+    Insert a random reply tree with ids and paths set up front: one comment in
+    ten is top-level, the others answer one of the 50 latest. Returns the ids
+    of the top-level comments.
+    """
+    paths, roots, batch = {}, [], []
+    first = (Comment.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+    for pk in range(first, first + comments):
+        parent = None if pk == first or rng.random() < 0.1 else rng.randrange(max(first, pk - 50), pk)
+        if parent is not None and len(paths[parent]) // 10 >= 24:
+            parent = None
+        paths[pk] = reply_path(paths[parent] if parent else '', pk)
+        if parent is None:
+            roots.append(pk)
+        batch.append(Comment(id=pk, article_id=article_id, author_id=author_id, content='comment ' * 5,
+                             parent_id=parent, path=paths[pk]))
+        if len(batch) == batch_size:
+            Comment.objects.bulk_create(batch)
+            batch = []
+    Comment.objects.bulk_create(batch)
+    return roots
+
+
+def _levels(root, depth):
+    # the adjacency list way: one query per level
+    rows, level = list(Comment.objects.filter(id=root).values_list('id', 'parent_id')), [root]
+    for _ in range(depth):
+        children = list(Comment.objects.filter(parent_id__in=level).values_list('id', 'parent_id'))
+        rows += children
+        level = [pk for pk, parent in children]
+    return rows
+
+
+def run(options):
+    rng = random.Random(0)
+    with scratch_database():
+        user_ids, article_ids = seed(users=1, articles=1)
+        roots = _tree(article_ids[0], user_ids[0], options['comments'], rng)
+        comments = Comment.objects.filter(article_id=article_ids[0])
+        paths = list(comments.values_list('path', flat=True))
+        limit, depth, columns = options['limit'], options['depth'], THREAD_ENTRY.columns
+
+        def page(queryset, after=None):
+            params = {'limit': limit}
+            if after is not None:
+                params['after'] = encode_cursor(after)
+            return paginate_thread(queryset, params, *columns)
+
+        def root_path():
+            return Comment.objects.filter(id=rng.choice(roots)).values_list('path', flat=True).first()
+
+        queries = [
+            ('thread_first_page', 'path', lambda: page(subtree(comments))),
+            ('thread_middle_page', 'path', lambda: page(subtree(comments), rng.choice(paths))),
+            ('subtree_page', 'path', lambda: page(subtree(comments, root_path()))),
+            ('subtree_depth_{}'.format(depth), 'path',
+             lambda: list(subtree(comments, root_path(), depth).order_by('path').values_list(*columns))),
+            ('subtree_depth_{}'.format(depth), 'per-level', lambda: _levels(rng.choice(roots), depth)),
+        ]
+
+        results = []
+        for name, method, query in queries:
+            query()  # warm up
+            row = {'query': name, 'method': method, 'comments': len(paths)}
+            row.update(summarize(measure(query, options['repeat'])))
+            results.append(row)
+        return results
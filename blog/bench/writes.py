@@ -0,0 +1,88 @@
+"""
+Throughput of concurrent comment POSTs: every thread signs in as its own user
+and posts comments through the full request cycle (sessions, CSRF-exempt test
+client, view, INSERT).
+
+On SQLite the scratch database is a file (not the test runner's in-memory
+database) and the run is repeated with stock settings and with
+BLOG_SQLITE_PRAGMAS (WAL), so the file lock is what gets measured. Other
+backends run once with the configured settings.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+
+from . import scratch_database, seed, summarize
+
+help = 'comments/sec and latency of concurrent comment POSTs'
+
+
+def add_arguments(parser):
+    parser.add_argument('--threads', type=int, action='append', help='concurrent writers (default: 1, 4, 16)')
+    parser.add_argument('--requests', type=int, default=2000, help='comments posted per run')
+
+
+def _post_comments(users, article_ids, requests):
+    # [(milliseconds, ok)] of ``requests`` comment POSTs shared by one thread per user
+    position, lock = iter(range(requests)), threading.Lock()
+
+    def work(user):
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(user)
+        samples = []
+        try:
+            while True:
+                with lock:
+                    i = next(position, None)
+                if i is None:
+                    return samples
+                path = '/api/article/{}/comment/'.format(article_ids[i % len(article_ids)])
+                start = time.perf_counter()
+                try:
+                    status = client.post(path, json.dumps({'content': 'bench'}), content_type='application/json')\
+                        .status_code
+                except OperationalError:
+                    status = 500
+                samples.append(((time.perf_counter() - start) * 1000, status == 201))
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        return [sample for samples in pool.map(work, users) for sample in samples]
+
+
+def _run(label, threads, requests):
+    results = []
+    user_ids, article_ids = seed(users=max(threads), articles=100)
+    users = list(User.objects.filter(id__in=user_ids).order_by('id'))
+    for count in threads:
+        start = time.perf_counter()
+        samples = _post_comments(users[:count], article_ids, requests)
+        elapsed = time.perf_counter() - start
+        row = {'database': label, 'threads': count, 'rps': round(len(samples) / elapsed, 1),
+               'errors': sum(1 for ms, ok in samples if not ok)}
+        row.update(summarize([ms for ms, ok in samples]))
+        results.append(row)
+    return results
+
+
+def run(options):
+    threads = options['threads'] or [1, 4, 16]
+    if connection.vendor != 'sqlite':
+        with scratch_database():
+            return _run(connection.vendor, threads, options['requests'])
+
+    results = []
+    for label, pragmas in (('sqlite stock', {}), ('sqlite wal', settings.BLOG_SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory() as directory, override_settings(BLOG_SQLITE_PRAGMAS=pragmas), \
+                scratch_database(os.path.join(directory, 'bench.sqlite3')):
+            results += _run(label, threads, options['requests'])
+    return results
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import CharField, TextField
+
+from .serializers import loads
+
+
+class BadBatch(ValueError):
+    pass
+
+
+def load_batch(request):
+    # the JSON array of a bulk request; raises BadBatch (or JSONDecodeError) if there is none
+    items = loads(request.body)
+    if not isinstance(items, list) or not 0 < len(items) <= settings.BLOG_BULK_MAX_ITEMS:
+        raise BadBatch(items)
+    return items
+
+
+def item_values(item, model, *keys):
+    """
+    Values of ``keys`` in one batch item, or None if the item is malformed: a
+    key is missing, or the value of one of ``model``'s text fields is not a
+    string that fits the column.
+    """
+    try:
+        values = tuple(item[key] for key in keys)
+    except (KeyError, TypeError):
+        return None
+    for key, value in zip(keys, values):
+        field = model._meta.get_field(key)
+        if isinstance(field, (CharField, TextField)) and \
+                not (isinstance(value, str) and (field.max_length is None or len(value) <= field.max_length)):
+            return None
+    return values
+
+
+def item_id(item):
+    return item if isinstance(item, int) and not isinstance(item, bool) else None
+
+
+def check_owned(model, ids, user_id, *fields):
+    """
+    Status of writing each row of ``ids`` of ``model`` as ``user_id``, in one
+    query: 200 if owned, 403 if someone else's, 404 if missing, and 400 for a
+    malformed id or one repeated within the batch. Also returns the rows found,
+    by id, with ``author_id`` and ``fields``.
+    """
+    rows = {row['id']: row for row in model.objects.filter(id__in={pk for pk in ids if pk is not None})
+            .values('id', 'author_id', *fields)}
+    statuses, seen = [], set()
+    for pk in ids:
+        if pk is None or pk in seen:
+            statuses.append(400)
+        elif pk not in rows:
+            statuses.append(404)
+        else:
+            statuses.append(200 if rows[pk]['author_id'] == user_id else 403)
+        seen.add(pk)
+    return statuses, rows
+
+
+def bulk_insert(model, objs, author_id):
+    """
+    bulk_create ``objs`` (all by ``author_id``), making sure their ids are set.
+    Must run inside a transaction: on backends that cannot return ids from a
+    bulk INSERT they are read back as the author's newest rows, which holds
+    since the write lock is ours until commit.
+    """
+    model.objects.bulk_create(objs)
+    if objs and not connection.features.can_return_rows_from_bulk_insert:
+        ids = model.objects.filter(author_id=author_id).order_by('-id').values_list('id', flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(ids)):
+            obj.id = pk
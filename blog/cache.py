@@ -0,0 +1,228 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.db.models import Count, Max
+
+from .conditional import resource_validators, summary_etag
+from .models import Article, Comment
+from .serializers import ARTICLE, dumps
+
+# striped locks: concurrent misses of one key in a process share a single rebuild
+_rebuild_locks = [threading.Lock() for _ in range(64)]
+
+
+def blog_cache():
+    return caches[settings.BLOG_CACHE]
+
+
+# Entries are stored as (generation, value). An invalidation gives its keys a
+# new generation (under '<key>:gen', read in the same round trip as the entry)
+# and a fill stores the generation it read before its SELECT, so a fill that
+# raced a write's invalidation stores an entry no reader accepts.
+
+def _generation_key(key):
+    return key + ':gen'
+
+
+def _get_entries(cache, keys):
+    """
+    The live entries of ``keys`` as {key: value}, and the generation each
+    missing one is to be stored under, as {key: generation}.
+    """
+    found = cache.get_many(list(keys) + [_generation_key(key) for key in keys])
+    entries, generations = {}, {}
+    for key in keys:
+        generation = found.get(_generation_key(key))
+        if generation is None:
+            # never invalidated (or evicted): no entry left behind is trusted
+            generation = uuid.uuid4().hex
+            if not cache.add(_generation_key(key), generation, None):
+                generation = cache.get(_generation_key(key), generation)
+        entry = found.get(key)
+        if entry is not None and entry[0] == generation:
+            entries[key] = entry[1]
+        else:
+            generations[key] = generation
+    return entries, generations
+
+
+def _set_entries(cache, entries, generations):
+    cache.set_many({key: (generations[key], value) for key, value in entries.items()},
+                   settings.BLOG_ARTICLE_CACHE_TIMEOUT)
+
+
+def article_key(article_id):
+    return 'blog:article:{}'.format(article_id)
+
+
+def get_article(article_id):
+    """
+    Read-through cache of GET /api/article/<id>/: the encoded payload with its
+    validators, as (body, etag, last_modified). Returns None if the article
+    does not exist (misses are not cached).
+    """
+    cache = blog_cache()
+    key = article_key(article_id)
+    entries, generations = _get_entries(cache, [key])
+    if key in entries:
+        return entries[key]
+    # filled from the primary: a lagging replica would keep a stale copy alive after the invalidation
+    article = Article.objects.using(router.db_for_write(Article)).filter(id=article_id) \
+        .values_list(*ARTICLE.columns, 'updated_at').first()
+    if article is None:
+        return None
+    entry = (dumps(ARTICLE.as_dict(article)),) + resource_validators(article_id, article[-1])
+    _set_entries(cache, {key: entry}, generations)
+    return entry
+
+
+def invalidate_article(article_id):
+    invalidate_articles([article_id])
+
+
+def invalidate_articles(article_ids):
+    # the detail entries, the listing blocks holding them and the listing summary
+    cache = blog_cache()
+    keys = [article_key(pk) for pk in article_ids] + \
+        list({listing_block_key(listing_block(pk)) for pk in article_ids}) + [LISTING_SUMMARY_KEY]
+    cache.set_many(dict.fromkeys(map(_generation_key, keys), uuid.uuid4().hex), None)
+    cache.delete_many(keys)
+
+
+# The plain article listing (GET /api/article/, pages included) is cached in
+# blocks of BLOG_ARTICLE_LISTING_BLOCK consecutive ids: block b holds the
+# encoded entries of the articles with ids in [b * size + 1, (b + 1) * size].
+# Pages and the full list are stitched from blocks; a write only drops the
+# block of the article it touches (and the summary: etag and last id).
+
+LISTING_SUMMARY_KEY = 'blog:articles:summary'
+
+
+def listing_block(article_id):
+    return (article_id - 1) // settings.BLOG_ARTICLE_LISTING_BLOCK
+
+
+def listing_block_key(block):
+    return 'blog:articles:block:{}'.format(block)
+
+
+def _primary_articles():
+    # filled from the primary, like the article entries
+    return Article.objects.using(router.db_for_write(Article))
+
+
+def get_listing_summary():
+    # (etag, last article id or None) of the whole listing
+    cache = blog_cache()
+    entries, generations = _get_entries(cache, [LISTING_SUMMARY_KEY])
+    if not entries:
+        with _rebuild_locks[hash(LISTING_SUMMARY_KEY) % len(_rebuild_locks)]:
+            entries, generations = _get_entries(cache, [LISTING_SUMMARY_KEY])
+            if not entries:
+                aggregate = _primary_articles().aggregate(count=Count('id'), latest=Max('updated_at'), last=Max('id'))
+                entries = {LISTING_SUMMARY_KEY: (summary_etag(aggregate['count'], aggregate['latest']),
+                                                 aggregate['last'])}
+                _set_entries(cache, entries, generations)
+    return entries[LISTING_SUMMARY_KEY]
+
+
+def _build_blocks(blocks):
+    # one range query for the span of ``blocks``: {block: [(id, encoded entry)]}
+    size = settings.BLOG_ARTICLE_LISTING_BLOCK
+    built = {block: [] for block in range(min(blocks), max(blocks) + 1)}
+    rows = _primary_articles().filter(id__gt=min(blocks) * size, id__lte=(max(blocks) + 1) * size) \
+        .order_by('id').values_list('id', *ARTICLE.columns)
+    for row in rows:
+        built[listing_block(row[0])].append((row[0], ARTICLE.encode_rows([row[1:]])[1:-1]))
+    return built
+
+
+def get_listing_blocks(blocks):
+    """
+    The cached blocks ``blocks`` (consecutive numbers), as lists of (id, encoded
+    entry). Missing blocks are rebuilt together in one query; concurrent
+    requests missing the same blocks wait for that rebuild instead of running
+    their own.
+    """
+    cache = blog_cache()
+    keys = {block: listing_block_key(block) for block in blocks}
+    found, generations = _get_entries(cache, list(keys.values()))
+    missing = [block for block in blocks if keys[block] not in found]
+    if missing:
+        # stripes are taken in order, so two rebuilds never wait on each other
+        locks = [_rebuild_locks[i] for i in sorted({hash(keys[block]) % len(_rebuild_locks) for block in missing})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            rebuilt, generations = _get_entries(cache, [keys[block] for block in missing])
+            found.update(rebuilt)
+            missing = [block for block in missing if keys[block] not in found]
+            if missing:
+                # the span rebuilt may cover live blocks: only the missing ones are stored
+                built = {listing_block_key(block): entries for block, entries in _build_blocks(missing).items()
+                         if block in missing}
+                _set_entries(cache, built, generations)
+                found.update(built)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    return [found[keys[block]] for block in blocks]
+
+
+def _join(entries):
+    return b'[' + b','.join(entry for pk, entry in entries) + b']'
+
+
+def get_listing():
+    # the encoded full listing
+    etag, last = get_listing_summary()
+    if last is None:
+        return b'[]'
+    return _join(entry for block in get_listing_blocks(range(listing_block(last) + 1)) for entry in block)
+
+
+def get_listing_page(after, limit):
+    """
+    The encoded entries of the articles after id ``after`` (at most ``limit``)
+    and the id of the last one if more follow, otherwise None.
+    """
+    etag, last = get_listing_summary()
+    entries = []
+    block, window = listing_block(after + 1), limit // settings.BLOG_ARTICLE_LISTING_BLOCK + 2
+    while last is not None and len(entries) <= limit and block <= listing_block(last):
+        blocks = range(block, min(block + window, listing_block(last) + 1))
+        entries += [(pk, entry) for entries_ in get_listing_blocks(blocks) for pk, entry in entries_ if pk > after]
+        block = blocks[-1] + 1
+    return _join(entries[:limit]), entries[limit - 1][0] if len(entries) > limit else None
+
+
+def author_count_key(model, user_id):
+    return 'blog:user:{}:{}_count'.format(user_id, model._meta.model_name)
+
+
+def get_author_count(model, user_id):
+    """
+    Cached number of ``model`` rows (articles or comments) written by a user.
+    Views drop it on their own writes; cascades (comments of a deleted
+    article) are only caught up by BLOG_AUTHOR_COUNT_CACHE_TIMEOUT.
+    """
+    cache = blog_cache()
+    key = author_count_key(model, user_id)
+    count = cache.get(key)
+    if count is None:
+        count = model.objects.using(router.db_for_write(model)).filter(author_id=user_id).count()
+        cache.set(key, count, settings.BLOG_AUTHOR_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_author_count(model, user_id):
+    blog_cache().delete(author_count_key(model, user_id))
+
+
+def invalidate_author_counts(user_id):
+    # deleting articles also deletes the author's comments on them
+    invalidate_author_count(Article, user_id)
+    invalidate_author_count(Comment, user_id)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core import checks
+
+# cache backends private to each worker process
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    # cache-backed sessions must live in a cache all the workers share, or a signout only reaches one
+    if settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES:
+        return []
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get('BACKEND')
+    if backend not in LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        '{} keeps sessions in the {!r} cache, which is local to each process.'.format(
+            settings.SESSION_ENGINE, settings.SESSION_CACHE_ALIAS),
+        hint='Set BLOG_SESSION_CACHE_LOCATION to a memcached server shared by all the workers.',
+        id='blog.E001',
+    )]
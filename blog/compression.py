@@ -0,0 +1,144 @@
+"""
+Response compression negotiated from Accept-Encoding (CompressionMiddleware).
+
+gzip is always available; zstd and br are offered when the zstandard and
+brotli packages are installed, in the order of BLOG_COMPRESSION_ENCODINGS.
+Bodies of the BLOG_COMPRESSION_TYPES content types are compressed from
+BLOG_COMPRESSION_MIN_SIZE bytes on (smaller ones gain nothing); streamed
+bodies are compressed chunk by chunk, whatever their size.
+
+Bodies with an ETag - the cached listings and articles among them, the
+ones asked for again and again - are compressed once per encoding: the
+result is kept in BLOG_CACHE under the encoding and a digest of the body
+itself, so a validator that misses one of the representation's inputs never
+serves stale bytes. As with Django's GZipMiddleware, the ETag of an encoded
+body is weakened: the bytes depend on the encoding. Bodies sent as they are
+keep their strong ETag, and so do the 304s that stand for them.
+"""
+import hashlib
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+
+from .cache import blog_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _BrotliCompressor:
+    # brotli.Compressor behind the compress() / flush() interface of the others
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+# encoding: compressor factory, from the level of BLOG_COMPRESSION_LEVELS
+CODECS = {
+    # wbits 31: a gzip container around the deflate stream
+    'gzip': lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+}
+if brotli is not None:
+    CODECS['br'] = _BrotliCompressor
+if zstandard is not None:
+    CODECS['zstd'] = lambda level: zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def compressor(encoding):
+    return CODECS[encoding](settings.BLOG_COMPRESSION_LEVELS[encoding])
+
+
+def compress(encoding, data):
+    compressobj = compressor(encoding)
+    return compressobj.compress(data) + compressobj.flush()
+
+
+def compress_stream(encoding, chunks):
+    compressobj = compressor(encoding)
+    for chunk in chunks:
+        data = compressobj.compress(chunk)
+        if data:
+            yield data
+    yield compressobj.flush()
+
+
+def negotiate(accept_encoding):
+    # the first encoding of BLOG_COMPRESSION_ENCODINGS available here and accepted by the client, or None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        match = re.match(r'\s*q\s*=\s*([0-9.]+)', params)
+        try:
+            accepted[name.strip().lower()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            accepted[name.strip().lower()] = 0.0
+    for encoding in settings.BLOG_COMPRESSION_ENCODINGS:
+        if encoding in CODECS and accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _cached_compress(response, encoding):
+    if not response.has_header('ETag'):
+        return compress(encoding, response.content)
+    # sha256 (hardware-accelerated) hashes a body in a fraction of the time compressing it takes
+    key = 'blog:compressed:{}:{}'.format(encoding, hashlib.sha256(response.content).hexdigest())
+    cache = blog_cache()
+    body = cache.get(key)
+    if body is None:
+        body = compress(encoding, response.content)
+        cache.set(key, body, settings.BLOG_COMPRESSION_CACHE_TIMEOUT)
+    return body
+
+
+def _weaken_etag(response):
+    if response.has_header('ETag') and not response['ETag'].startswith('W/'):
+        response['ETag'] = 'W/' + response['ETag']
+
+
+class CompressionMiddleware(MiddlewareMixin):
+
+    def process_response(self, request, response):
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if response.status_code == 304:
+            # the validators of the 200 this stands for: weak only if the client's copy was encoded
+            if encoding is not None and response.has_header('ETag') and \
+                    'W/' + response['ETag'] in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                _weaken_etag(response)
+            return response
+        if response.has_header('Content-Encoding') or \
+                not response.get('Content-Type', '').startswith(settings.BLOG_COMPRESSION_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.BLOG_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(encoding, response.streaming_content)
+        else:
+            body = _cached_compress(response, encoding)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
@@ -0,0 +1,47 @@
+"""
+Validators for conditional GETs (If-None-Match / If-Modified-Since -> 304).
+
+Single resources are validated by their ``updated_at``. Collections are
+validated by (row count, latest ``updated_at``): every INSERT and UPDATE moves
+the latest timestamp and every DELETE changes the count. Both come from one
+aggregate answered by an index, without reading any payload. Collections only
+get an ETag: a Last-Modified built from the latest timestamp would miss deletes.
+"""
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _timestamp(updated_at):
+    return None if updated_at is None else int(updated_at.timestamp() * 1000000)
+
+
+def resource_validators(pk, updated_at):
+    # (etag, last_modified) of one row; last_modified in seconds since the epoch
+    return '"{}-{}"'.format(pk, _timestamp(updated_at)), int(updated_at.timestamp())
+
+
+def collection_etag(queryset):
+    # (etag, row count) of ``queryset``, in one query
+    summary = queryset.aggregate(count=Count('id'), latest=Max('updated_at'))
+    return summary_etag(summary['count'], summary['latest']), summary['count']
+
+
+def summary_etag(count, latest):
+    # the etag of a collection of ``count`` rows last updated at ``latest``
+    return '"{}-{}"'.format(count, _timestamp(latest))
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    # the 304 response if the client's copy is current, otherwise None
+    current = set_validators(HttpResponse(), etag, last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=current)
+    return None if response is current else response
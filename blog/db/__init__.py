@@ -0,0 +1,23 @@
+"""
+Per-connection database setup, wired in blog.signals.
+
+SQLite connections get BLOG_SQLITE_PRAGMAS (WAL journal and friends) as soon
+as they are opened. Persistent connections (CONN_MAX_AGE > 0) are checked at
+the start of each request when BLOG_DB_HEALTH_CHECKS is on: Django 3.1 would
+otherwise hand a connection the server has dropped to the request's first
+query (CONN_HEALTH_CHECKS only exists from Django 4.1).
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(connection):
+    with connection.cursor() as cursor:
+        for pragma, value in settings.BLOG_SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA {} = {}'.format(pragma, value))
+
+
+def close_unusable_connections():
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,99 @@
+"""
+PostgreSQL backend with a per-process connection pool (ENGINE
+'blog.db.postgresql', pool size DATABASES[alias]['POOL_SIZE']).
+
+Closing a connection - Django does it at the end of every request with
+CONN_MAX_AGE = 0 - hands it back to the pool, rolled back, instead of closing
+the socket; the next request of any thread picks it up without paying for a
+new backend process. Threads wait up to POOL_TIMEOUT seconds for a free
+connection. With BLOG_DB_HEALTH_CHECKS, idle connections are checked before
+they are handed out.
+"""
+from collections import deque
+import threading
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+import psycopg2
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, size):
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = deque()
+
+    def acquire(self, timeout):
+        # an idle connection, or None when the caller has to open one; either way it holds a slot
+        if not self.slots.acquire(timeout=timeout):
+            raise psycopg2.OperationalError('no free connection in the pool after {} seconds'.format(timeout))
+        while True:
+            try:
+                connection = self.idle.pop()
+            except IndexError:
+                return None
+            if not connection.closed and (not settings.BLOG_DB_HEALTH_CHECKS or self._usable(connection)):
+                return connection
+            connection.close()
+
+    def release(self, connection=None):
+        try:
+            if connection is not None and not connection.closed:
+                self._reset(connection)
+        finally:
+            self.slots.release()
+
+    def _reset(self, connection):
+        try:
+            if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            connection.close()
+        else:
+            self.idle.append(connection)
+
+    @staticmethod
+    def _usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+
+def get_pool(conn_params, size):
+    # one pool per set of connection parameters: test databases get their own
+    key = repr(sorted(conn_params.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(size)
+        return _pools[key]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(conn_params, self.settings_dict['POOL_SIZE'])
+        connection = pool.acquire(self.settings_dict.get('POOL_TIMEOUT', 10))
+        if connection is None:
+            try:
+                connection = super().get_new_connection(conn_params)
+            except Exception:
+                pool.release()
+                raise
+        else:
+            # what the parent sets up for a fresh connection
+            self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                pool, self.pool = self.pool, None
+                pool.release(self.connection)
@@ -0,0 +1,130 @@
+"""
+Set-based deletion of articles and their comment threads.
+
+QuerySet.delete() runs Django's Collector, which loads every article it
+deletes, and every comment too since replies cascade from their parent, level
+by level, before its DELETEs. delete_articles() skips it: one DELETE for the
+comments, then the articles; delete_subtrees() deletes comments with their
+replies as path ranges. Signals are only paid for when something listens:
+the articles (blog.signals invalidates the caches on their post_delete) are
+loaded and signalled around a single DELETE, and comments go through the
+Collector.
+
+Articles with more than BLOG_PURGE_ASYNC_THRESHOLD comments can be purged in
+the background instead (purge_later): their comments are deleted
+BLOG_PURGE_CHUNK_SIZE at a time, each chunk in its own short transaction so
+other writers get the write lock in between, and the article goes last. It
+stays readable until then; a purge cut short by a restart leaves it with part
+of its comments, to be deleted again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+import logging
+from operator import or_
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, pre_delete
+
+from .cache import invalidate_author_counts
+from .models import Article, Comment
+from .threads import subtree_end
+
+logger = logging.getLogger(__name__)
+
+# one purge at a time, whatever the number of large threads deleted at once
+_purges = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blog-purge')
+
+
+def _has_listeners(model):
+    return pre_delete.has_listeners(model) or post_delete.has_listeners(model)
+
+
+def _delete_comments(comments, using):
+    if _has_listeners(Comment):
+        return comments.using(using).delete()[0]
+    return comments._raw_delete(using)
+
+
+def _delete_articles(articles, using):
+    # called once their comments are gone: the Collector would only look for them again
+    if not _has_listeners(Article):
+        return articles._raw_delete(using)
+    instances = list(articles.using(using))
+    if not instances:
+        return 0
+    for article in instances:
+        pre_delete.send(sender=Article, instance=article, using=using)
+    Article.objects.filter(id__in=[article.id for article in instances])._raw_delete(using)
+    for article in instances:
+        post_delete.send(sender=Article, instance=article, using=using)
+    return len(instances)
+
+
+def delete_articles(articles):
+    """
+    Delete the ``articles`` queryset and their comments with one DELETE per
+    table; returns the number of articles deleted.
+    """
+    using = router.db_for_write(Article)
+    # like the Collector: a transaction of its own, but no savepoint inside the caller's
+    with transaction.atomic(using=using, savepoint=False):
+        _delete_comments(Comment.objects.filter(article__in=articles.values('id')), using)
+        return _delete_articles(articles, using)
+
+
+def delete_subtrees(comments):
+    """
+    Delete ``comments`` - (id, article_id, path) triples - and all their
+    replies, with one DELETE of path ranges whatever the depth; returns the
+    number of comments deleted.
+    """
+    if not comments:
+        return 0
+    # a comment without a path (bulk inserted and not filled in) is deleted on its own
+    condition = reduce(or_, (
+        Q(article_id=article_id, path__gte=path, path__lt=subtree_end(path)) if path else Q(id=pk)
+        for pk, article_id, path in comments
+    ))
+    return _delete_comments(Comment.objects.filter(condition), router.db_for_write(Comment))
+
+
+def is_large_thread(article_id):
+    # whether the article has more than BLOG_PURGE_ASYNC_THRESHOLD comments (never, if None)
+    threshold = settings.BLOG_PURGE_ASYNC_THRESHOLD
+    return threshold is not None and \
+        Comment.objects.filter(article_id=article_id).order_by()[threshold:threshold + 1].exists()
+
+
+def purge(article_id):
+    # the article's comments chunk by chunk, then the article; returns the number of comments deleted
+    using, chunk_size, deleted = router.db_for_write(Comment), settings.BLOG_PURGE_CHUNK_SIZE, 0
+    while True:
+        # newest first: replies go before the comments they answer
+        ids = list(Comment.objects.using(using).filter(article_id=article_id).order_by('-id')
+                   .values_list('id', flat=True)[:chunk_size])
+        if ids:
+            with transaction.atomic(using=using):
+                deleted += _delete_comments(Comment.objects.filter(id__in=ids), using)
+        if len(ids) < chunk_size:
+            break
+        time.sleep(settings.BLOG_PURGE_CHUNK_PAUSE)
+    # comments posted meanwhile go with the article
+    delete_articles(Article.objects.filter(id=article_id))
+    return deleted
+
+
+def _purge(article_id, author_id):
+    try:
+        purge(article_id)
+        invalidate_author_counts(author_id)
+    except Exception:
+        logger.exception('Purging article %s failed', article_id)
+    finally:
+        connections.close_all()
+
+
+def purge_later(article_id, author_id):
+    _purges.submit(_purge, article_id, author_id)
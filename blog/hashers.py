@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the iteration count of settings.BLOG_PASSWORD_ITERATIONS. The
+    algorithm name is unchanged, so existing hashes stay valid and are rehashed
+    to the configured cost on the next successful sign-in (must_update).
+    """
+
+    @property
+    def iterations(self):
+        return settings.BLOG_PASSWORD_ITERATIONS
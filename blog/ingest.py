@@ -0,0 +1,131 @@
+"""
+Write-behind comment ingestion (on when BLOG_COMMENT_QUEUE names a journal file).
+
+article_id_comment POST validates a comment, appends it to a local SQLite
+journal and answers 202: the database sees no write. A worker thread in each
+process flushes the journal every BLOG_COMMENT_QUEUE_INTERVAL seconds, with
+one transaction and one bulk_create per BLOG_COMMENT_QUEUE_BATCH comments, so
+a burst takes the database write lock a few times instead of once per
+comment. ``manage.py flush_comments`` drains the journal by hand (on deploys,
+or with the worker off).
+
+Until it is flushed, a comment only shows up in its author's reads of the
+article's comments, without an id. Delivery is at least once: a crash between
+the database commit and the journal commit inserts that batch again. Comments
+whose article or author is gone by flush time are dropped.
+"""
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .cache import invalidate_author_count
+from .models import Article, Comment
+from .threads import fill_root_paths
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS pending (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'article_id INTEGER NOT NULL, author_id INTEGER NOT NULL, content TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS pending_author_article ON pending (author_id, article_id)',
+)
+
+# journal connections of the current thread, by path (sqlite3 connections stay in their thread)
+_local = threading.local()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _journal():
+    journals = _local.__dict__.setdefault('journals', {})
+    path = settings.BLOG_COMMENT_QUEUE
+    if path not in journals:
+        # autocommit: each append is its own (fsynced) transaction
+        journal = sqlite3.connect(path, timeout=20, isolation_level=None)
+        journal.execute('PRAGMA journal_mode = wal')
+        journal.execute('PRAGMA synchronous = full')
+        for statement in _SCHEMA:
+            journal.execute(statement)
+        journals[path] = journal
+    return journals[path]
+
+
+def enqueue(article_id, author_id, content):
+    _journal().execute('INSERT INTO pending (article_id, author_id, content) VALUES (?, ?, ?)',
+                       (article_id, author_id, content))
+    start_worker()
+
+
+def pending_rows(schema, article_id, user):
+    # ``user``'s comments on the article still in the journal, as rows of ``schema``
+    start_worker()
+    values = {'article_id': article_id, 'author_id': user.id, 'author__username': user.username}
+    return [tuple(content if column == 'content' else values[column] for column in schema.columns)
+            for content, in _journal().execute(
+                'SELECT content FROM pending WHERE author_id = ? AND article_id = ? ORDER BY seq',
+                (user.id, article_id))]
+
+
+def _insert(rows):
+    # bulk_create the (seq, article_id, author_id, content) rows whose article and author still exist
+    with transaction.atomic():
+        articles = set(Article.objects.filter(id__in={row[1] for row in rows}).values_list('id', flat=True))
+        authors = set(User.objects.filter(id__in={row[2] for row in rows}).values_list('id', flat=True))
+        comments = [Comment(article_id=article_id, author_id=author_id, content=content)
+                    for seq, article_id, author_id, content in rows
+                    if article_id in articles and author_id in authors]
+        Comment.objects.bulk_create(comments)
+        fill_root_paths({comment.article_id for comment in comments})
+    for author_id in {comment.author_id for comment in comments}:
+        invalidate_author_count(Comment, author_id)
+    return len(comments)
+
+
+def flush():
+    """
+    Move the journal into the database, batch by batch; returns the number of
+    comments inserted. Each batch holds the journal's write lock until it is
+    committed on both sides, so concurrent flushes never insert it twice.
+    """
+    journal, inserted = _journal(), 0
+    while True:
+        journal.execute('BEGIN IMMEDIATE')
+        try:
+            rows = journal.execute('SELECT seq, article_id, author_id, content FROM pending ORDER BY seq LIMIT ?',
+                                   (settings.BLOG_COMMENT_QUEUE_BATCH,)).fetchall()
+            if rows:
+                inserted += _insert(rows)
+                journal.execute('DELETE FROM pending WHERE seq <= ?', (rows[-1][0],))
+            journal.execute('COMMIT')
+        except BaseException:
+            journal.execute('ROLLBACK')
+            raise
+        if not rows:
+            return inserted
+
+
+def _run():
+    while True:
+        time.sleep(settings.BLOG_COMMENT_QUEUE_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Flushing the comment queue failed')
+            # the database may have dropped it: reconnect on the next round
+            connection.close()
+
+
+def start_worker():
+    global _worker
+    if _worker is not None or settings.BLOG_COMMENT_QUEUE_INTERVAL is None:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name='blog-comment-queue', daemon=True)
+            _worker.start()
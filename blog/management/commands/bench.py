@@ -0,0 +1,53 @@
+from importlib import import_module
+import json
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+SCENARIOS = ['indexes', 'asgi', 'serialization', 'auth', 'search', 'load', 'writes', 'deletes', 'threads']
+
+
+def _revision():
+    # the checked out commit, to tell saved results apart
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Run a benchmark scenario against a scratch copy of the default database.'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='scenario', required=True)
+        # the options of each scenario, saved along with its results
+        self.scenario_options = {}
+        for name in SCENARIOS:
+            scenario = import_module('blog.bench.{}'.format(name))
+            subparser = subparsers.add_parser(name, help=scenario.help)
+            scenario.add_arguments(subparser)
+            self.scenario_options[name] = [action.dest for action in subparser._actions if action.dest != 'help']
+            subparser.add_argument('--output', help='also save the results and options to this JSON file')
+
+    def handle(self, *args, **options):
+        scenario = import_module('blog.bench.{}'.format(options['scenario']))
+        results = scenario.run(options)
+        columns = list(results[0])
+        rows = [columns] + [[str(row[column]) for column in columns] for row in results]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+        for row in rows:
+            self.stdout.write('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'scenario': options['scenario'],
+                    'revision': _revision(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'options': {name: options[name] for name in self.scenario_options[options['scenario']]},
+                    'results': results,
+                }, f, indent=2)
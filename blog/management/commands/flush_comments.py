@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.ingest import flush
+
+
+class Command(BaseCommand):
+    help = 'Insert the comments waiting in the BLOG_COMMENT_QUEUE journal.'
+
+    def handle(self, *args, **options):
+        if not settings.BLOG_COMMENT_QUEUE:
+            raise CommandError('BLOG_COMMENT_QUEUE is not set.')
+        self.stdout.write('{} comments inserted.'.format(flush()))
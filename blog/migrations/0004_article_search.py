@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over blog_article, kept in sync by
+# triggers. Django rebuilds SQLite tables on most schema changes, which drops
+# their triggers: any later migration altering blog_article must recreate them
+# (blog.tests checks that search follows writes).
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE blog_article_fts USING fts5("
+    "title, content, content='blog_article', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO blog_article_fts(blog_article_fts, rank) VALUES('rank', 'bm25(2.0, 1.0)')",
+    "INSERT INTO blog_article_fts(blog_article_fts) VALUES('rebuild')",
+    "CREATE TRIGGER blog_article_fts_insert AFTER INSERT ON blog_article BEGIN "
+    "INSERT INTO blog_article_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER blog_article_fts_delete AFTER DELETE ON blog_article BEGIN "
+    "INSERT INTO blog_article_fts(blog_article_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER blog_article_fts_update AFTER UPDATE OF title, content ON blog_article BEGIN "
+    "INSERT INTO blog_article_fts(blog_article_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO blog_article_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER blog_article_fts_insert',
+    'DROP TRIGGER blog_article_fts_delete',
+    'DROP TRIGGER blog_article_fts_update',
+    'DROP TABLE blog_article_fts',
+]
+
+# PostgreSQL: a GIN index on the expression blog.search.SEARCH_VECTOR
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX blog_article_search_idx ON blog_article USING GIN (("
+    "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', content), 'B')))",
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX blog_article_search_idx',
+]
+
+
+def run(statements):
+    def run_statements(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run_statements
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
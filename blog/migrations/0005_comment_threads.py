@@ -0,0 +1,36 @@
+# Generated by Django 3.1.2 on 2026-10-18 00:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Cast, LPad
+
+
+def fill_paths(apps, schema_editor):
+    # every existing comment is top-level: its path is its own id (blog.threads.ROOT_PATH)
+    Comment = apps.get_model('blog', 'Comment')
+    Comment.objects.update(path=LPad(Cast('id', models.CharField()), 10, models.Value('0')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_article_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=250),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'path'], name='blog_comment_article_path_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 
 
@@ -9,20 +9,63 @@ class Article(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='articles'
+        related_name='articles',
+        db_index=False  # covered by blog_article_author_id_idx
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # articles of an author, in listing order
+            models.Index(fields=['author', 'id'], name='blog_article_author_id_idx'),
+        ]
 
 
 class Comment(models.Model):
     article = models.ForeignKey(
         Article,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False  # covered by blog_comment_article_id_idx
     )
     content = models.TextField()
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False  # covered by blog_comment_author_id_idx
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    # the comment replied to; replies go with it
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        null=True,
+        blank=True
     )
+    # ids of the ancestors then its own, zero-padded (blog.threads): thread order and subtree ranges
+    path = models.CharField(max_length=250, default='', editable=False)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # comments of an article / of an author, in listing order
+            models.Index(fields=['article', 'id'], name='blog_comment_article_id_idx'),
+            # comments of an article in thread order, subtrees
+            models.Index(fields=['article', 'path'], name='blog_comment_article_path_idx'),
+            models.Index(fields=['author', 'id'], name='blog_comment_author_id_idx'),
+            # the latest change among an article's comments (conditional GET)
+            models.Index(fields=['article', 'updated_at'], name='blog_comment_article_upd_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .threads import reply_path
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Comment), savepoint=False):
+            super().save(*args, **kwargs)
+            if not self.path:
+                # made of ids, its own included: only known once inserted
+                self.path = reply_path(self.parent.path if self.parent_id else '', self.id)
+                Comment.objects.filter(id=self.id).update(path=self.path)
 
@@ -0,0 +1,65 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import binascii
+
+from django.conf import settings
+
+# the largest primary key a cursor can hold (a signed 64-bit integer column)
+MAX_CURSOR = 2 ** 63 - 1
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def wants_page(params):
+    return 'limit' in params or 'after' in params
+
+
+def encode_cursor(position):
+    return urlsafe_b64encode(str(position).encode()).decode().rstrip('=')
+
+
+def decode_text_cursor(cursor):
+    try:
+        return urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise InvalidPage(cursor) from e
+
+
+def decode_cursor(cursor):
+    try:
+        pk = int(decode_text_cursor(cursor))
+    except ValueError as e:
+        raise InvalidPage(cursor) from e
+    if not 0 <= pk <= MAX_CURSOR:
+        raise InvalidPage(cursor)
+    return pk
+
+
+def parse_page(params, decode=decode_cursor):
+    # (limit, after: the ``decode``d cursor, 0 without one) from the query string; raises InvalidPage on bad input
+    try:
+        limit = int(params.get('limit', settings.BLOG_PAGE_SIZE))
+    except ValueError as e:
+        raise InvalidPage(params['limit']) from e
+    if limit < 1:
+        raise InvalidPage(limit)
+    limit = min(limit, settings.BLOG_MAX_PAGE_SIZE)
+
+    after = params.get('after')
+    return limit, (decode(after) if after else 0)
+
+
+def paginate(queryset, params, *fields):
+    """
+    Keyset pagination on the primary key: one indexed range scan per page,
+    whatever the depth. Returns the page rows (``fields`` tuples) and the
+    cursor of the next page, or None on the last page.
+    """
+    limit, after = parse_page(params)
+    rows = list(queryset.filter(pk__gt=after).order_by('pk').values_list('id', *fields)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        del rows[limit:]
+        next_cursor = encode_cursor(rows[-1][0])
+    return [row[1:] for row in rows], next_cursor
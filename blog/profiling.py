@@ -0,0 +1,237 @@
+"""
+Opt-in per-request instrumentation (BLOG_PROFILING=1 adds ProfilingMiddleware).
+
+Every request records its wall time, SQL query count and SQL time (through an
+execute wrapper installed on each connection, so the worker threads of
+blog.async_views are counted too), JSON encoding time and session + user
+resolution time. The figures are sent back in a Server-Timing header and
+accumulated per route into histograms served in the Prometheus text format
+by ``metrics`` (mounted at /metrics/). The registry lives in the process: with
+several workers, each one is scraped on its own.
+
+A sample of requests (BLOG_PROFILING_SAMPLE_RATE) runs under cProfile, and the
+profiles of those slower than BLOG_PROFILING_SLOW_MS are dumped into
+BLOG_PROFILING_DIR, for ``python -m pstats`` or snakeviz. cProfile only sees
+the thread it runs in: under ASGI, profile the WSGI deployment instead.
+"""
+import asyncio
+import contextvars
+import cProfile
+from functools import wraps
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import get_user
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject
+
+_recorder = contextvars.ContextVar('blog_profiling_recorder', default=None)
+
+
+class Recorder:
+    """Time (seconds) and call counts of one request, by kind: db, json, auth."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = {'db': 0.0, 'json': 0.0, 'auth': 0.0}
+        self.queries = 0
+
+    def add(self, kind, seconds):
+        self.seconds[kind] += seconds
+
+
+def timed(kind):
+    # decorator: the time spent in the function is added to the current request's ``kind``
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder.get()
+            if recorder is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.add(kind, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _execute(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add('db', time.perf_counter() - start)
+        recorder.queries += 1
+
+
+def _install(connection, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Per (route, method): duration and DB time histograms, query and JSON time totals."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, method, recorder, duration):
+        buckets = [ms / 1000 for ms in settings.BLOG_PROFILING_BUCKETS_MS]
+        with self.lock:
+            if (route, method) not in self.routes:
+                self.routes[route, method] = {'duration': Histogram(buckets), 'db': Histogram(buckets),
+                                              'queries': 0, 'json': 0.0}
+            series = self.routes[route, method]
+            series['duration'].observe(duration)
+            series['db'].observe(recorder.seconds['db'])
+            series['queries'] += recorder.queries
+            series['json'] += recorder.seconds['json']
+
+    def exposition(self):
+        # the Prometheus text format (version 0.0.4)
+        lines = []
+        with self.lock:
+            routes = sorted(self.routes.items())
+            for name, kind, help_ in (('blog_request_duration_seconds', 'duration', 'Wall time of requests.'),
+                                      ('blog_db_duration_seconds', 'db', 'SQL time of requests.')):
+                lines += ['# HELP {} {}'.format(name, help_), '# TYPE {} histogram'.format(name)]
+                for (route, method), series in routes:
+                    histogram, labels = series[kind], 'route="{}",method="{}"'.format(route, method)
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+                    lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, histogram.count))
+                    lines.append('{}_sum{{{}}} {}'.format(name, labels, histogram.sum))
+                    lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+            for name, kind, help_ in (('blog_db_queries_total', 'queries', 'SQL queries run by requests.'),
+                                      ('blog_json_seconds_total', 'json', 'JSON encoding time of requests.')):
+                lines += ['# HELP {} {}'.format(name, help_), '# TYPE {} counter'.format(name)]
+                for (route, method), series in routes:
+                    lines.append('{}{{route="{}",method="{}"}} {}'.format(name, route, method, series[kind]))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+_profiling = threading.Lock()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+def _server_timing(recorder, duration):
+    return 'total;dur={:.3f}, db;dur={:.3f};desc="{} queries", json;dur={:.3f}, auth;dur={:.3f}'.format(
+        duration * 1000, recorder.seconds['db'] * 1000, recorder.queries, recorder.seconds['json'] * 1000,
+        recorder.seconds['auth'] * 1000)
+
+
+def _dump(profile, request, duration):
+    os.makedirs(settings.BLOG_PROFILING_DIR, exist_ok=True)
+    name = '{}-{}-{}-{}ms.prof'.format(time.strftime('%Y%m%d%H%M%S'), request.method,
+                                       _route(request).replace('/', '_').strip('_') or 'root', int(duration * 1000))
+    profile.dump_stats(os.path.join(settings.BLOG_PROFILING_DIR, name))
+
+
+class ProfilingMiddleware:
+    """
+    Outermost middleware: measures whole requests, session and user resolution
+    included (the lazy request.user is re-wrapped in process_view, once every
+    other middleware has run).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._is_coroutine = asyncio.iscoroutinefunction(get_response)
+        if self._is_coroutine:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(_install, dispatch_uid='blog.profiling')
+        for connection in connections.all():
+            _install(connection)
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        recorder, token = self._start()
+        profile = self._profile()
+        try:
+            response = self.get_response(request) if profile is None else profile.runcall(self.get_response, request)
+        finally:
+            _recorder.reset(token)
+            if profile is not None:
+                _profiling.release()
+        duration = time.perf_counter() - recorder.start
+        if profile is not None and duration * 1000 >= settings.BLOG_PROFILING_SLOW_MS:
+            _dump(profile, request, duration)
+        return self._finish(request, response, recorder, duration)
+
+    async def __acall__(self, request):
+        recorder, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, recorder, time.perf_counter() - recorder.start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = _recorder.get()
+        if recorder is not None and hasattr(request, 'user') and not hasattr(request, '_cached_user'):
+            request.user = SimpleLazyObject(lambda: self._get_user(request, recorder))
+
+    @staticmethod
+    def _get_user(request, recorder):
+        start = time.perf_counter()
+        try:
+            return get_user(request)
+        finally:
+            recorder.add('auth', time.perf_counter() - start)
+
+    @staticmethod
+    def _start():
+        recorder = Recorder()
+        return recorder, _recorder.set(recorder)
+
+    @staticmethod
+    def _profile():
+        # one profiled request at a time (holding _profiling); None when this one is not sampled
+        if random.random() >= settings.BLOG_PROFILING_SAMPLE_RATE or not _profiling.acquire(blocking=False):
+            return None
+        return cProfile.Profile()
+
+    @staticmethod
+    def _finish(request, response, recorder, duration):
+        response['Server-Timing'] = _server_timing(recorder, duration)
+        registry.observe(_route(request), request.method, recorder, duration)
+        return response
+
+
+def metrics(request):
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
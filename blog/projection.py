@@ -0,0 +1,37 @@
+from .serializers import Schema
+
+# ?expand= name: the fields it adds to payloads holding an author id (one JOIN, no query per row)
+EXPANDS = {
+    'author': (('author_username', 'author__username', str),),
+}
+
+_EXPANDED = {field for fields in EXPANDS.values() for field in fields}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(params, schema):
+    """
+    The payload schema restricted to the fields asked for with
+    ?fields=title,author (``schema`` itself without the parameter), then
+    extended with the related fields asked for with ?expand=author. Only the
+    columns of the returned schema are SELECTed.
+    """
+    if 'fields' in params:
+        fields = {name for name in params['fields'].split(',') if name}
+        if not fields or not fields <= set(schema.keys):
+            raise InvalidFields(params['fields'])
+        schema = schema.project(fields)
+    expand = {name for name in params.get('expand', '').split(',') if name}
+    if not expand <= set(EXPANDS):
+        raise InvalidFields(params['expand'])
+    if expand:
+        schema = Schema(*schema.fields, *(field for name in sorted(expand) for field in EXPANDS[name]))
+    return schema
+
+
+def expanded(schema):
+    # whether ``schema`` has ?expand= fields: the validators of its rows (own updated_at) do not cover them
+    return any(field in _EXPANDED for field in schema.fields)
@@ -0,0 +1,104 @@
+"""
+Rate limiting (RateLimitMiddleware): every route (by URL name) gets a token
+bucket per client IP and, for requests with a session cookie, one per
+session, sized by BLOG_RATE_LIMITS ('*' sizes the buckets of the routes it
+does not name). An empty bucket answers 429 with a Retry-After header before
+the view runs: no password hashing and no view query.
+
+Neither bucket costs any I/O. The session one is keyed by (a digest of) the
+cookie, without loading the session or the user: under ASGI, Django runs
+middleware hooks in the one thread shared by all sync code, and blog.async_views
+resolves both in worker threads instead. A client signed in several times has
+a bucket per session; one sending made-up cookies is still held by its IP's.
+
+Buckets live in BLOG_RATE_LIMIT_STORE: MemoryStore keeps them in the process
+(each worker limits on its own); CacheStore counts fixed windows in a cache
+shared by all workers (atomic incr on memcached or Redis).
+"""
+from collections import OrderedDict
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+
+class MemoryStore:
+    """Token buckets of this process, the least recently used dropped beyond ``max_keys``."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def take(self, key, requests, seconds):
+        # seconds to wait before a token is available; 0 when one was taken
+        rate, now = requests / seconds, time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.pop(key, (requests, now))
+            tokens = min(requests, tokens + (now - last) * rate)
+            if tokens >= 1:
+                tokens, wait = tokens - 1, 0
+            else:
+                wait = (1 - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class CacheStore:
+    """Fixed windows of ``seconds`` counted in the BLOG_RATE_LIMIT_CACHE cache."""
+
+    def take(self, key, requests, seconds):
+        cache, now = caches[settings.BLOG_RATE_LIMIT_CACHE], time.time()
+        window = int(now // seconds)
+        key = 'blog:ratelimit:{}:{}'.format(key, window)
+        if cache.add(key, 1, seconds + 1):
+            count = 1
+        else:
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # expired between add() and incr()
+                cache.set(key, 1, seconds + 1)
+                count = 1
+        return 0 if count <= requests else (window + 1) * seconds - now
+
+
+def client_ip(request):
+    return request.META.get(settings.BLOG_RATE_LIMIT_IP_HEADER, '')
+
+
+def too_many_requests(wait):
+    response = HttpResponse(status=429)
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.store = import_string(settings.BLOG_RATE_LIMIT_STORE)()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = request.resolver_match.url_name
+        limits = settings.BLOG_RATE_LIMITS.get(route, settings.BLOG_RATE_LIMITS.get('*', {}))
+
+        if 'ip' in limits:
+            wait = self.store.take('ip:{}:{}'.format(route, client_ip(request)), *limits['ip'])
+            if wait:
+                return too_many_requests(wait)
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if 'user' in limits and session_key:
+            # session keys are credentials: the stores only see a digest
+            digest = hashlib.md5(session_key.encode()).hexdigest()
+            wait = self.store.take('user:{}:{}'.format(route, digest), *limits['user'])
+            if wait:
+                return too_many_requests(wait)
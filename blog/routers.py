@@ -0,0 +1,94 @@
+"""
+Read-replica routing (enabled when BLOG_DB_REPLICAS names replica aliases).
+
+ReplicaMiddleware marks the requests whose reads may go to a replica: safe
+methods (GET, HEAD, OPTIONS) from clients that have not written in the last
+BLOG_REPLICA_PIN_SECONDS. Every unsafe request sets a cookie pinning its
+client to the primary for that long, so a client reads its own writes whatever
+the replication lag; so does every request to a view marked @writes, for the
+views that write on safe methods (GET signout flushes the session).
+ReplicaRouter sends the marked reads to a random replica and everything else -
+writes, reads of unsafe requests and @writes views, reads outside requests -
+to the primary. The flag is a contextvar, so it follows the request into the
+worker threads of blog.async_views.
+"""
+import asyncio
+import contextvars
+from functools import wraps
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_COOKIE = 'blog_primary'
+
+_use_replicas = contextvars.ContextVar('blog_use_replicas', default=False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if settings.BLOG_DB_REPLICAS and _use_replicas.get():
+            return random.choice(settings.BLOG_DB_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+
+def writes(view):
+    # a view that writes whatever the method: it reads from the primary and pins its client there
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.pins_primary = True
+        token = _use_replicas.set(False)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replicas.reset(token)
+    return wrapper
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._is_coroutine = asyncio.iscoroutinefunction(get_response)
+        if self._is_coroutine:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        token = _use_replicas.set(self._may_use_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replicas.set(self._may_use_replicas(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+        return self._pin(request, response)
+
+    @staticmethod
+    def _may_use_replicas(request):
+        return request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    @staticmethod
+    def _pin(request, response):
+        if request.method not in SAFE_METHODS or getattr(request, 'pins_primary', False):
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.BLOG_REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,61 @@
+"""
+Full-text search over article titles and contents.
+
+SQLite searches the FTS5 table blog_article_fts and PostgreSQL the GIN index
+on SEARCH_VECTOR, both created by 0004_article_search; results are ranked
+(bm25 / ts_rank) with titles weighted above contents. Other backends fall back
+to a case-insensitive scan.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Article
+
+# must stay identical to the indexed expression of 0004_article_search
+SEARCH_VECTOR = "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', content), 'B')"
+
+
+def _fts5_query(query):
+    # every word as a quoted FTS5 string (implicitly ANDed): user input never reaches the query syntax
+    return ' '.join('"{}"'.format(word) for word in re.findall(r'\w+', query))
+
+
+def _select(columns):
+    # SELECT list and JOIN clause of ``columns`` (values_list names: article columns or author__username)
+    users = get_user_model()._meta.db_table
+    select = ', '.join('{}.username'.format(users) if column == 'author__username'
+                       else 'blog_article.{}'.format(column) for column in columns)
+    join = ' JOIN {0} ON {0}.id = blog_article.author_id'.format(users) if 'author__username' in columns else ''
+    return select, join
+
+
+def search_articles(query, columns, limit, offset):
+    """
+    ``columns`` of the articles matching ``query``, best first, as tuples.
+    """
+    connection = connections[router.db_for_read(Article)]
+    vendor = connection.vendor
+    select, join = _select(columns)
+    if vendor == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return []
+        sql = ('SELECT {} FROM blog_article_fts JOIN blog_article ON blog_article.id = blog_article_fts.rowid{} '
+               'WHERE blog_article_fts MATCH %s ORDER BY blog_article_fts.rank, blog_article.id '
+               'LIMIT %s OFFSET %s').format(select, join)
+        params = [match, limit, offset]
+    elif vendor == 'postgresql':
+        sql = ('SELECT {0} FROM blog_article{2}, plainto_tsquery(\'english\', %s) query '
+               'WHERE {1} @@ query ORDER BY ts_rank({1}, query) DESC, blog_article.id '
+               'LIMIT %s OFFSET %s').format(select, SEARCH_VECTOR, join)
+        params = [query, limit, offset]
+    else:
+        return list(Article.objects.filter(Q(title__icontains=query) | Q(content__icontains=query))
+                    .order_by('id').values_list(*columns)[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_user
+from .cache import invalidate_article
+from .db import close_unusable_connections, configure_sqlite
+from .models import Article
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def article_changed(sender, instance, using, **kwargs):
+    article_id = instance.id
+    invalidate_article(article_id)
+    # inside a transaction, again once it commits: a fill in between reads the row as it was
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: invalidate_article(article_id), using=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        configure_sqlite(connection)
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    if settings.BLOG_DB_HEALTH_CHECKS:
+        close_unusable_connections()
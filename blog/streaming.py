@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .serializers import dumps
+
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def wants_stream(params):
+    return 'stream' in params
+
+
+def iterate(queryset):
+    # server-side iteration: rows are fetched chunk by chunk, never cached on the queryset
+    return queryset.iterator(chunk_size=settings.BLOG_STREAM_CHUNK_SIZE)
+
+
+def _ndjson(items):
+    for item in items:
+        yield dumps(item) + b'\n'
+
+
+def _json_array(items):
+    separator = b'['
+    for item in items:
+        yield separator + dumps(item)
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+def streaming_response(items, stream_format):
+    """
+    Encode ``items`` (an iterable of JSON-serializable objects) one by one into
+    a StreamingHttpResponse, either as a JSON array or as newline-delimited JSON.
+    Returns None for an unknown format.
+    """
+    if stream_format not in STREAM_FORMATS:
+        return None
+    chunks = _ndjson(items) if stream_format == 'ndjson' else _json_array(items)
+    return StreamingHttpResponse(chunks, content_type=STREAM_FORMATS[stream_format])
@@ -0,0 +1,58 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+
+INCLUDES = ('comment_count', 'latest_comment')
+
+
+class InvalidInclude(ValueError):
+    pass
+
+
+def parse_include(params):
+    # the comment summaries asked for with ?include=comment_count,latest_comment
+    include = {name for name in params.get('include', '').split(',') if name}
+    if not include <= set(INCLUDES):
+        raise InvalidInclude(include)
+    return include
+
+
+def _article_comments():
+    return Comment.objects.filter(article_id=OuterRef('pk')).order_by()
+
+
+def annotate_summary(queryset, include):
+    """
+    Annotate articles with the requested comment summaries. Each one is a
+    correlated subquery answered from the (article_id, id) index, so a listing
+    stays a single query however many articles it returns.
+    """
+    if 'comment_count' in include:
+        count = _article_comments().values('article_id').annotate(count=Count('*')).values('count')
+        queryset = queryset.annotate(comment_count=Coalesce(Subquery(count, output_field=IntegerField()), 0))
+    if 'latest_comment' in include:
+        latest = _article_comments().order_by('-id')
+        queryset = queryset.annotate(latest_comment_content=Subquery(latest.values('content')[:1]),
+                                     latest_comment_author=Subquery(latest.values('author_id')[:1]))
+    return queryset
+
+
+def summary_fields(include):
+    fields = ()
+    if 'comment_count' in include:
+        fields += ('comment_count',)
+    if 'latest_comment' in include:
+        fields += ('latest_comment_content', 'latest_comment_author')
+    return fields
+
+
+def summary_of(row, include):
+    # the payload entries of the summaries annotated on ``row`` (a dict from .values())
+    summary = {}
+    if 'comment_count' in include:
+        summary['comment_count'] = row['comment_count']
+    if 'latest_comment' in include:
+        summary['latest_comment'] = None if row['latest_comment_author'] is None else {
+            'content': row['latest_comment_content'], 'author': row['latest_comment_author']}
+    return summary
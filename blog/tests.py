@@ -1,7 +1,31 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+import asyncio
+import gzip
+from concurrent.futures import ThreadPoolExecutor
 import json
+import os
+import tempfile
+import time
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from . import cache as blog_cache, checks, compression, deletion, ingest, profiling, ratelimit, serializers
 from .models import Article, Comment
+from .pagination import encode_cursor
+from .routers import PIN_COOKIE, ReplicaMiddleware
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, router
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+
+try:
+    from .db.postgresql import base as pool_backend
+except ImproperlyConfigured:  # psycopg2 is not installed
+    pool_backend = None
 
 
 class BlogTestCase(TestCase):
@@ -10,8 +34,8 @@ class BlogTestCase(TestCase):
     dump_comment = json.dumps({'content': 'there is no one asked'})
 
     def setUp(self):
-        # Article.objects.create(title="title1", content="content1", author= )
-        return
+        # ids are reused across tests, so cached payloads must not leak between them
+        cache.clear()
 
     @staticmethod
     def get_csrf(client):
@@ -323,3 +347,1375 @@ class BlogTestCase(TestCase):
         ## DELETE
         response = client.delete(path, HTTP_X_CSRFTOKEN=csrftoken)
         self.assertEqual(response.status_code, 200)  # Pass csrf protection
+
+    def test_article_pagination(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        path = '/api/article/'
+
+        # 401 test (before login)
+        response = client.get(path, {'limit': 2}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 401)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        user = User.objects.get(id=1)
+        for i in range(5):
+            Article.objects.create(title='title{}'.format(i), content='content', author=user)
+
+        # 400 test (malformed limit, cursor; a cursor past the largest id, whatever the listing)
+        overflow = encode_cursor(2 ** 63)
+        for params in ({'limit': 'a'}, {'limit': 0}, {'after': '!!!'}, {'after': 'LTE'}, {'after': overflow},
+                       {'after': overflow, 'fields': 'title'}, {'after': overflow, 'include': 'comment_count'}):
+            response = client.get(path, params, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 400)
+        response = client.get('/api/user/1/article/', {'after': overflow}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 400)
+        response = client.get(path, {'after': encode_cursor(2 ** 63 - 1)}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['results'], [])
+
+        # 200 test (walk every page)
+        titles = []
+        params = {'limit': 2}
+        while True:
+            response = client.get(path, params, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 2)
+            titles += [article['title'] for article in page['results']]
+            if page['next'] is None:
+                break
+            params = {'limit': 2, 'after': page['next']}
+        self.assertEqual(titles, ['title{}'.format(i) for i in range(5)])
+
+        # default page size
+        response = client.get(path, {'after': ''}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertIsNone(response.json()['next'])
+
+    def test_stream(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        user = User.objects.get(id=1)
+
+        # empty listing still streams a valid JSON array
+        response = client.get('/api/article/', {'stream': 'json'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+        article = Article.objects.create(title='title', content='content', author=user)
+        Article.objects.create(title='title2', content='content2', author=user)
+        Comment.objects.create(content='comment', article=article, author=user)
+        Comment.objects.create(content='comment2', article=article, author=user)
+
+        # 400 test (unknown format)
+        response = client.get('/api/article/', {'stream': 'xml'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/api/article/1/comment/', {'stream': 'xml'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 400)
+
+        # 200 test (JSON array)
+        response = client.get('/api/article/', {'stream': 'json'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)),
+                         [{'title': 'title', 'content': 'content', 'author': 1},
+                          {'title': 'title2', 'content': 'content2', 'author': 1}])
+
+        # 200 test (NDJSON)
+        response = client.get('/api/article/1/comment/', {'stream': 'ndjson'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'article': 1, 'content': 'comment', 'author': 1},
+                          {'article': 1, 'content': 'comment2', 'author': 1}])
+
+    def test_signout_everywhere(self):
+        # sessions are read from the database: deleting one signs it out in every process
+        client = Client()
+        client.force_login(User.objects.create_user(username='chris', password='chris'))
+        self.assertEqual(client.get('/api/article/').status_code, 200)
+        Session.objects.all().delete()
+        self.assertEqual(client.get('/api/article/').status_code, 401)
+
+        self.assertEqual(checks.check_session_cache(None), [])
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db'):
+            self.assertEqual([error.id for error in checks.check_session_cache(None)], ['blog.E001'])
+
+    def test_article_cache(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        path = '/api/article/1/'
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        article = Article.objects.create(title='title', content='content', author=User.objects.get(id=1))
+
+        # second read is served from the cache
+        response = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), {'title': 'title', 'content': 'content', 'author': 1})
+        with self.assertNumQueries(1):  # the session: user and article are cached
+            response = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['title'], 'title')
+
+        # post_save invalidates writes made outside the views
+        article.title = 'saved'
+        article.save()
+        self.assertEqual(client.get(path, HTTP_X_CSRFTOKEN=csrftoken).json()['title'], 'saved')
+
+        # PUT invalidates
+        response = client.put(path, self.dump_article, content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(path, HTTP_X_CSRFTOKEN=csrftoken).json()['title'], 'my tmi')
+
+        # DELETE invalidates
+        response = client.delete(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        response = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 404)
+
+    def test_article_cache_fill_race(self):
+        # a fill that read the row before a write's invalidation is not served afterwards
+        user = User.objects.create_user('user', password='user')
+        article = Article.objects.create(title='old', content='content', author=user)
+        resource_validators, build_blocks = blog_cache.resource_validators, blog_cache._build_blocks
+
+        def validators_racing(*args):
+            Article.objects.filter(id=article.id).update(title='new')
+            blog_cache.invalidate_article(article.id)
+            return resource_validators(*args)
+
+        with mock.patch.object(blog_cache, 'resource_validators', validators_racing):
+            self.assertIn(b'old', blog_cache.get_article(article.id)[0])
+        self.assertIn(b'new', blog_cache.get_article(article.id)[0])
+
+        def build_racing(blocks):
+            built = build_blocks(blocks)
+            Article.objects.filter(id=article.id).update(title='newer')
+            blog_cache.invalidate_article(article.id)
+            return built
+
+        with mock.patch.object(blog_cache, '_build_blocks', build_racing):
+            self.assertIn(b'new', blog_cache.get_listing_blocks([0])[0][0][1])
+        self.assertIn(b'newer', blog_cache.get_listing_blocks([0])[0][0][1])
+
+    @override_settings(BLOG_ARTICLE_LISTING_BLOCK=2)
+    def test_article_listing_cache(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        path = '/api/article/'
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        for i in range(1, 6):
+            Article.objects.create(title='title{}'.format(i), content='content', author=user)
+
+        def titles(params=None):
+            response = client.get(path, params or {}, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            return [article['title'] for article in (payload['results'] if params else payload)]
+
+        def cached_blocks():
+            return [block for block in range(4) if cache.get(blog_cache.listing_block_key(block)) is not None]
+
+        def pages(limit):
+            result, params = [], {'limit': limit}
+            while True:
+                payload = client.get(path, params, HTTP_X_CSRFTOKEN=csrftoken).json()
+                result.append([article['title'] for article in payload['results']])
+                if payload['next'] is None:
+                    return result
+                params = {'limit': limit, 'after': payload['next']}
+
+        # blocks of 2 ids: [1, 2], [3, 4], [5]
+        self.assertEqual(titles(), ['title1', 'title2', 'title3', 'title4', 'title5'])
+        self.assertEqual(cached_blocks(), [0, 1, 2])
+        self.assertEqual(pages(3), [['title1', 'title2', 'title3'], ['title4', 'title5']])
+
+        # writes only drop the block of their article
+        response = client.put('/api/article/3/', self.dump_article, content_type='application/json',
+                              HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cached_blocks(), [0, 2])
+        self.assertEqual(titles({'limit': 2, 'after': encode_cursor(2)}), ['my tmi', 'title4'])
+        self.assertEqual(cached_blocks(), [0, 1, 2])
+        response = client.delete('/api/article/2/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cached_blocks(), [1, 2])
+        response = client.post(path, self.dump_article, content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(cached_blocks(), [1])  # id 6 lands in the block of id 5
+        self.assertEqual(pages(2), [['title1', 'my tmi'], ['title4', 'title5'], ['my tmi']])
+        response = client.post('/api/article/bulk/', json.dumps([{'title': 'bulk', 'content': 'bulk'}] * 2),
+                               content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(titles()[-3:], ['my tmi', 'bulk', 'bulk'])
+
+        # the listing's etag follows the writes
+        etag = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)['ETag']
+        self.assertEqual(client.get(path, HTTP_IF_NONE_MATCH=etag, HTTP_X_CSRFTOKEN=csrftoken).status_code, 304)
+        Article.objects.create(title='title', content='content', author=user)
+        self.assertEqual(client.get(path, HTTP_IF_NONE_MATCH=etag, HTTP_X_CSRFTOKEN=csrftoken).status_code, 200)
+
+    def test_listing_single_flight(self):
+        # concurrent misses of the same blocks share one rebuild
+        builds = []
+
+        def build(blocks):
+            builds.append(list(blocks))
+            time.sleep(0.05)
+            return {block: [(block + 1, b'{}')] for block in blocks}
+
+        with mock.patch.object(blog_cache, '_build_blocks', build), ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: blog_cache.get_listing_blocks(range(3)), range(8)))
+        self.assertEqual(builds, [[0, 1, 2]])
+        self.assertEqual(results, [[[(1, b'{}')], [(2, b'{}')], [(3, b'{}')]]] * 8)
+
+    def test_article_bulk(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        path = '/api/article/bulk/'
+
+        # 405 test (GET)
+        response = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 405)
+
+        # 401 test (POST, PUT, DELETE before login)
+        for method in (client.post, client.put, client.delete):
+            response = method(path, data=None, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 401)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+
+        # 400 test (not a batch)
+        for method in (client.post, client.put, client.delete):
+            for body in ('{', json.dumps({}), json.dumps([]), json.dumps([1] * 1001)):
+                response = method(path, body, content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+                self.assertEqual(response.status_code, 400)
+
+        ## POST
+        response = client.post(path, json.dumps([{'title': 'a', 'content': 'a'}, {'title': 'b'},
+                                                 {'title': None, 'content': 'x'}, {'title': 'x', 'content': {'x': 1}},
+                                                 {'title': 'x' * 65, 'content': 'x'},
+                                                 {'title': 'c', 'content': 'c'}]),
+                               content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'status': 201, 'id': 1, 'title': 'a', 'content': 'a', 'author_id': 1},
+            {'status': 400}, {'status': 400}, {'status': 400}, {'status': 400},
+            {'status': 201, 'id': 2, 'title': 'c', 'content': 'c', 'author_id': 1},
+        ])
+        self.assertEqual(list(Article.objects.values_list('title', flat=True)), ['a', 'c'])
+
+        other_user = User.objects.create_user(username="swpp", password="iluvswpp")
+        other_article = Article.objects.create(title='other', content='other', author=other_user)
+
+        ## PUT
+        response = client.put(path, json.dumps([{'id': 1, 'title': 'A', 'content': 'A'}, {'id': 1},
+                                                {'id': 1, 'title': 'X', 'content': 'X'},
+                                                {'id': other_article.id, 'title': 'X', 'content': 'X'},
+                                                {'id': 999, 'title': 'X', 'content': 'X'},
+                                                {'id': 2, 'title': 'X', 'content': None}]),
+                              content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()], [200, 400, 400, 403, 404, 400])
+        self.assertEqual(response.json()[0], {'status': 200, 'id': 1, 'title': 'A', 'content': 'A', 'author_id': 1})
+        self.assertEqual(Article.objects.get(id=1).title, 'A')
+        self.assertEqual(Article.objects.get(id=other_article.id).title, 'other')
+
+        ## DELETE
+        Comment.objects.create(content='comment', article_id=2, author=other_user)
+        response = client.delete(path, json.dumps([2, 'x', other_article.id, 999]),
+                                 content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'status': 200}, {'status': 400}, {'status': 403}, {'status': 404}])
+        self.assertEqual(list(Article.objects.values_list('id', flat=True)), [1, other_article.id])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_bulk(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        path = '/api/comment/bulk/'
+
+        # 405 test (GET)
+        response = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 405)
+
+        # 401 test (POST, PUT, DELETE before login)
+        for method in (client.post, client.put, client.delete):
+            response = method(path, data=None, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 401)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        article = Article.objects.create(title='title', content='content', author=user)
+
+        # 400 test (not a batch)
+        for method in (client.post, client.put, client.delete):
+            response = method(path, json.dumps({}), content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 400)
+
+        ## POST
+        response = client.post(path, json.dumps([{'article': article.id, 'content': 'a'}, {'article': 999, 'content': 'b'},
+                                                 {'content': 'c'}, {'article': article.id, 'content': None},
+                                                 {'article': article.id, 'content': {'x': 1}},
+                                                 {'article': article.id, 'content': 'd'}]),
+                               content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'status': 201, 'id': 1, 'article_id': article.id, 'content': 'a', 'author_id': 1},
+            {'status': 404},
+            {'status': 400}, {'status': 400}, {'status': 400},
+            {'status': 201, 'id': 2, 'article_id': article.id, 'content': 'd', 'author_id': 1},
+        ])
+
+        other_user = User.objects.create_user(username="swpp", password="iluvswpp")
+        other_comment = Comment.objects.create(content='other', article=article, author=other_user)
+
+        ## PUT
+        response = client.put(path, json.dumps([{'id': 1, 'content': 'A'}, {'id': 'x', 'content': 'A'},
+                                                {'id': other_comment.id, 'content': 'X'}, {'id': 999, 'content': 'X'},
+                                                {'id': 2, 'content': None}]),
+                              content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'status': 200, 'id': 1, 'article_id': article.id, 'content': 'A', 'author_id': 1},
+                                           {'status': 400}, {'status': 403}, {'status': 404}, {'status': 400}])
+        self.assertEqual(Comment.objects.get(id=1).content, 'A')
+
+        ## DELETE
+        response = client.delete(path, json.dumps([1, other_comment.id, 999]),
+                                 content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'status': 200}, {'status': 403}, {'status': 404}])
+        self.assertEqual(list(Comment.objects.values_list('id', flat=True)), [2, other_comment.id])
+
+    def test_comment_summary(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        user = User.objects.get(id=1)
+        other_user = User.objects.create_user(username="swpp", password="iluvswpp")
+        article = Article.objects.create(title='title', content='content', author=user)
+        Article.objects.create(title='title2', content='content2', author=user)
+        Comment.objects.create(content='first', article=article, author=user)
+        Comment.objects.create(content='latest', article=article, author=other_user)
+        include = {'include': 'comment_count,latest_comment'}
+
+        # 400 test (unknown summary)
+        for path in ('/api/article/', '/api/article/1/'):
+            response = client.get(path, {'include': 'comments'}, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 400)
+
+        # 200 test (list, page, stream)
+        expected = [
+            {'title': 'title', 'content': 'content', 'author': 1, 'comment_count': 2,
+             'latest_comment': {'content': 'latest', 'author': other_user.id}},
+            {'title': 'title2', 'content': 'content2', 'author': 1, 'comment_count': 0, 'latest_comment': None},
+        ]
+        response = client.get('/api/article/', include, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), expected)
+        response = client.get('/api/article/', dict(include, limit=1), HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['results'], expected[:1])
+        response = client.get('/api/article/', dict(include, stream='json'), HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+        response = client.get('/api/article/', {'include': 'comment_count'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual([article['comment_count'] for article in response.json()], [2, 0])
+        self.assertNotIn('latest_comment', response.json()[0])
+
+        # 200, 404 test (detail)
+        response = client.get('/api/article/1/', include, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), expected[0])
+        response = client.get('/api/article/999/', include, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        article = Article.objects.create(title='title', content='content', author=user)
+        comment = Comment.objects.create(content='comment', article=article, author=user)
+
+        def assertNotModified(path, modified, **headers):
+            response = client.get(path, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response)
+            self.assertEqual(client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            for header in headers:
+                self.assertEqual(client.get(path, **{header: response[headers[header]]}).status_code, 304)
+            modified()
+            self.assertEqual(client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        # PUT, POST and DELETE all change the validators
+        dump_article = json.dumps({'title': 'new', 'content': 'new'})
+        assertNotModified('/api/article/', lambda: client.put('/api/article/1/', dump_article,
+                                                              content_type='application/json',
+                                                              HTTP_X_CSRFTOKEN=csrftoken))
+        assertNotModified('/api/article/1/', lambda: client.put('/api/article/1/', self.dump_article,
+                                                                content_type='application/json',
+                                                                HTTP_X_CSRFTOKEN=csrftoken),
+                          HTTP_IF_MODIFIED_SINCE='Last-Modified')
+        path = '/api/article/1/comment/'
+        assertNotModified(path, lambda: client.post(path, self.dump_comment, content_type='application/json',
+                                                    HTTP_X_CSRFTOKEN=csrftoken))
+        assertNotModified(path, lambda: client.delete('/api/comment/{}/'.format(comment.id),
+                                                      HTTP_X_CSRFTOKEN=csrftoken))
+        comment = Comment.objects.last()
+        assertNotModified('/api/comment/{}/'.format(comment.id),
+                          lambda: client.put('/api/comment/{}/'.format(comment.id), json.dumps({'content': 'new'}),
+                                             content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken),
+                          HTTP_IF_MODIFIED_SINCE='Last-Modified')
+        assertNotModified('/api/article/', lambda: client.put('/api/article/bulk/', json.dumps([dict(
+            id=1, title='bulk', content='bulk')]), content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken))
+        assertNotModified(path, lambda: client.put('/api/comment/bulk/', json.dumps([dict(
+            id=comment.id, content='bulk')]), content_type='application/json', HTTP_X_CSRFTOKEN=csrftoken))
+
+    def test_password_rehash(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        self.signup(client, csrftoken)
+        self.assertTrue(User.objects.get(id=1).password.startswith('pbkdf2_sha256$216000$'))
+
+        # signing in rehashes to the configured cost
+        with self.settings(BLOG_PASSWORD_ITERATIONS=1000):
+            self.signin(client, csrftoken)
+        self.assertTrue(User.objects.get(id=1).password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_user_cache(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        response = client.get('/api/article/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+
+        # saving the user drops the cached copy
+        user = User.objects.get(id=1)
+        user.is_active = False
+        user.save()
+        response = client.get('/api/article/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 401)
+
+    def test_article_search(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+        path = '/api/article/search/'
+
+        # 405, 401 test
+        response = client.post(path, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 405)
+        response = client.get(path, {'q': 'django'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 401)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        Article.objects.create(title='cooking', content='django in the kitchen', author=user)
+        Article.objects.create(title='django testing', content='assertNumQueries', author=user)
+        Article.objects.create(title='gardening', content='nothing to see', author=user)
+        deleted = Article.objects.create(title='django', content='deleted', author=user)
+        deleted.delete()
+
+        # 400 test (no query, bad cursor, offset out of range)
+        for params in ({}, {'q': '  '}, {'q': 'django', 'after': '!!!'},
+                       {'q': 'django', 'after': encode_cursor(2 ** 63)}):
+            response = client.get(path, params, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 400)
+        response = client.get(path, {'q': 'django', 'after': encode_cursor(2 ** 63 - 1)}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), {'results': [], 'next': None})
+
+        # ranked: title matches first; writes are searchable right away
+        response = client.get(path, {'q': 'Django'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([article['id'] for article in response.json()['results']], [2, 1])
+        self.assertEqual(response.json()['results'][0],
+                         {'id': 2, 'title': 'django testing', 'content': 'assertNumQueries', 'author': 1})
+        Article.objects.filter(id=3).update(content='django weeds')
+        response = client.get(path, {'q': 'django', 'limit': 2}, HTTP_X_CSRFTOKEN=csrftoken)
+        first_page = [article['id'] for article in response.json()['results']]
+        self.assertEqual(first_page[0], 2)
+        response = client.get(path, {'q': 'django', 'limit': 2, 'after': response.json()['next']},
+                              HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertIsNone(response.json()['next'])
+        self.assertEqual(sorted(first_page + [article['id'] for article in response.json()['results']]), [1, 2, 3])
+
+        # query syntax is not interpreted
+        for query in ('"django', 'django OR', 'NEAR(django', '*', '-django'):
+            response = client.get(path, {'q': query}, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 200)
+
+    def test_user_listing(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+
+        # 405, 401 test
+        response = client.post('/api/user/1/article/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 405)
+        response = client.get('/api/user/1/comment/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 401)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        other_user = User.objects.create_user(username='swpp', password='iluvswpp')
+        for i in range(3):
+            Article.objects.create(title='title{}'.format(i), content='content', author=user)
+        other_article = Article.objects.create(title='other', content='content', author=other_user)
+        Comment.objects.create(content='mine', article=other_article, author=user)
+        Comment.objects.create(content='theirs', article=other_article, author=other_user)
+
+        # 404 test (non-existing user), 400 test (bad cursor); a user without posts is an empty page
+        response = client.get('/api/user/999/article/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 404)
+        response = client.get('/api/user/1/article/', {'after': '!!!'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 400)
+        empty_user = User.objects.create_user(username='empty', password='empty')
+        response = client.get('/api/user/{}/comment/'.format(empty_user.id), HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), {'results': [], 'next': None})
+
+        # only the user's own rows, by pages
+        response = client.get('/api/user/1/article/', {'limit': 2, 'count': ''}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(response.json()['results'][0], {'id': 1, 'title': 'title0', 'content': 'content', 'author': 1})
+        response = client.get('/api/user/1/article/', {'after': response.json()['next']}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual([article['id'] for article in response.json()['results']], [3])
+        self.assertIsNone(response.json()['next'])
+        self.assertNotIn('count', response.json())
+        response = client.get('/api/user/1/comment/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['results'], [{'id': 1, 'article': 4, 'content': 'mine', 'author': 1}])
+
+        # counts follow the user's own writes
+        response = client.post('/api/article/', self.dump_article, content_type='application/json',
+                               HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 201)
+        response = client.get('/api/user/1/article/', {'count': ''}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['count'], 4)
+        response = client.delete('/api/article/1/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/user/1/article/', {'count': ''}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['count'], 3)
+        response = client.delete('/api/comment/1/', HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/user/1/comment/', {'count': ''}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), {'results': [], 'next': None, 'count': 0})
+
+    def test_field_projection(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        article = Article.objects.create(title='title', content='very long content', author=user)
+        Comment.objects.create(content='comment', article=article, author=user)
+
+        # 400 test (unknown or no field)
+        for path in ('/api/article/', '/api/article/1/', '/api/comment/1/'):
+            for fields in ('title,nope', ',', 'id'):
+                response = client.get(path, {'fields': fields}, HTTP_X_CSRFTOKEN=csrftoken)
+                self.assertEqual(response.status_code, 400)
+
+        # the payloads only hold the requested fields, in their usual order
+        expected = {
+            '/api/article/': [{'title': 'title', 'author': 1}],
+            '/api/article/1/': {'title': 'title', 'author': 1},
+            '/api/article/1/comment/': [{'article': 1, 'author': 1}],
+            '/api/comment/1/': {'article': 1, 'author': 1},
+            '/api/user/1/article/': {'results': [{'title': 'title', 'author': 1}], 'next': None},
+            '/api/user/1/comment/': {'results': [{'article': 1, 'author': 1}], 'next': None},
+            '/api/article/search/': {'results': [{'title': 'title', 'author': 1}], 'next': None},
+        }
+        for path, payload in expected.items():
+            fields = 'author,article' if 'comment' in path else 'author,title'
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(path, {'fields': fields, 'q': 'title'}, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), payload)
+            # the content column is never read
+            self.assertFalse([query for query in queries if 'content' in query['sql']])
+        response = client.get('/api/article/', {'fields': 'title', 'stream': 'ndjson'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(b''.join(response.streaming_content), b'{"title":"title"}\n')
+        response = client.get('/api/article/1/', {'fields': 'content', 'include': 'comment_count'},
+                              HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json(), {'content': 'very long content', 'comment_count': 1})
+
+    def test_author_expand(self):
+        client = Client(enforce_csrf_checks=True)
+        csrftoken = self.get_csrf(client)
+
+        # authenticate
+        self.signup(client, csrftoken)
+        self.signin(client, csrftoken)
+        csrftoken = self.get_csrf(client)
+        user = User.objects.get(id=1)
+        other_user = User.objects.create_user(username='swpp', password='iluvswpp')
+        article = Article.objects.create(title='title', content='content', author=user)
+        Comment.objects.create(content='comment', article=article, author=user)
+        Comment.objects.create(content='reply', article=article, author=other_user)
+
+        # 400 test (unknown expansion)
+        response = client.get('/api/article/', {'expand': 'article'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.status_code, 400)
+
+        article_payload = {'title': 'title', 'content': 'content', 'author': 1, 'author_username': 'chris'}
+        expected = {
+            '/api/article/': [article_payload],
+            '/api/article/1/': article_payload,
+            '/api/article/1/comment/': [
+                {'article': 1, 'content': 'comment', 'author': 1, 'author_username': 'chris'},
+                {'article': 1, 'content': 'reply', 'author': 2, 'author_username': 'swpp'},
+            ],
+            '/api/comment/2/': {'article': 1, 'content': 'reply', 'author': 2, 'author_username': 'swpp'},
+            '/api/user/2/comment/': {'results': [{'id': 2, 'article': 1, 'content': 'reply', 'author': 2,
+                                                  'author_username': 'swpp'}], 'next': None},
+            '/api/article/search/': {'results': [dict(article_payload, id=1)], 'next': None},
+        }
+        for path, payload in expected.items():
+            response = client.get(path, {'expand': 'author', 'q': 'title'}, HTTP_X_CSRFTOKEN=csrftoken)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), payload)
+            # the validators only cover the article / comment rows, not their authors
+            self.assertNotIn('ETag', response)
+            self.assertNotIn('Last-Modified', response)
+
+        # a rename shows at once
+        other_user.username = 'carol'
+        other_user.save()
+        response = client.get('/api/comment/2/', {'expand': 'author'}, HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['author_username'], 'carol')
+
+        # with projections and streams; usernames come from a JOIN, whatever the number of authors
+        response = client.get('/api/article/', {'expand': 'author', 'fields': 'title', 'limit': 1},
+                              HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(response.json()['results'], [{'title': 'title', 'author_username': 'chris'}])
+        response = client.get('/api/article/1/comment/', {'expand': 'author', 'stream': 'ndjson'},
+                              HTTP_X_CSRFTOKEN=csrftoken)
+        self.assertEqual(b''.join(response.streaming_content).count(b'"author_username"'), 2)
+        with self.assertNumQueries(2):  # the session, then the joined listing (no validators)
+            client.get('/api/article/1/comment/', {'expand': 'author'}, HTTP_X_CSRFTOKEN=csrftoken)
+
+
+# Sessions and users are served from the cache (warmed in setUp): requests only cost the view's queries.
+# The session cache is this process's LocMem one, standing in for BLOG_SESSION_CACHE_LOCATION's.
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class QueryCountTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='chris', password='chris')
+        self.other_user = User.objects.create_user(username='swpp', password='iluvswpp')
+        self.article = Article.objects.create(title='title', content='content', author=self.user)
+        self.other_article = Article.objects.create(title='title', content='content', author=self.other_user)
+        self.comment = Comment.objects.create(content='comment', article=self.article, author=self.user)
+        self.other_comment = Comment.objects.create(content='comment', article=self.article, author=self.other_user)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.client.get('/api/comment/{}/'.format(self.comment.id))
+
+    def assertQueries(self, num, method, path, data=None, **extra):
+        with self.assertNumQueries(num):
+            if data is None:
+                response = getattr(self.client, method)(path, **extra)
+            else:
+                response = getattr(self.client, method)(path, json.dumps(data), content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response
+
+    def test_user(self):
+        client = self.client
+        self.client = Client()
+        self.assertQueries(1, 'post', '/api/signup/', {'username': 'new', 'password': 'new'})
+        # user lookup, session key check, session INSERT, last_login UPDATE, session UPDATE and their savepoints
+        self.assertQueries(9, 'post', '/api/signin/', {'username': 'new', 'password': 'new'})
+        self.client = client
+        self.assertQueries(0, 'get', '/api/token/')
+        # logout() reads the session from the database before deleting it
+        self.assertQueries(2, 'get', '/api/signout/')
+
+    def test_article(self):
+        # the listing summary (validators) and blocks are cached: only a cold cache queries
+        response = self.assertQueries(2, 'get', '/api/article/')
+        self.assertQueries(0, 'get', '/api/article/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertQueries(0, 'get', '/api/article/', data=None, QUERY_STRING='limit=1')
+        self.assertQueries(1, 'get', '/api/article/', data=None, QUERY_STRING='fields=title&limit=1')
+        self.assertQueries(1, 'get', '/api/article/', data=None, QUERY_STRING='stream=ndjson')
+        self.assertQueries(1, 'post', '/api/article/', {'title': 'new', 'content': 'new'})
+        # a write drops the summary and the block of its article
+        self.assertQueries(2, 'get', '/api/article/', data=None, QUERY_STRING='limit=1')
+
+        # comment summaries are subqueries of the listing query
+        for i in range(10):
+            Article.objects.create(title='title', content='content', author=self.user)
+        include = 'include=comment_count,latest_comment'
+        self.assertQueries(1, 'get', '/api/article/', data=None, QUERY_STRING=include)
+        self.assertQueries(1, 'get', '/api/article/', data=None, QUERY_STRING=include + '&limit=5')
+
+    def test_article_id(self):
+        path = '/api/article/{}/'.format(self.article.id)
+        other_path = '/api/article/{}/'.format(self.other_article.id)
+        response = self.assertQueries(1, 'get', path)
+        self.assertQueries(0, 'get', path)  # cached
+        self.assertQueries(0, 'get', path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertQueries(1, 'get', '/api/article/999/')
+        self.assertQueries(1, 'get', path, data=None, QUERY_STRING='include=comment_count,latest_comment')
+
+        self.assertQueries(1, 'put', path, {'title': 'new', 'content': 'new'})
+        self.assertQueries(2, 'put', other_path, {'title': 'new', 'content': 'new'})
+        self.assertQueries(2, 'put', '/api/article/999/', {'title': 'new', 'content': 'new'})
+
+        # the comment DELETE and the article SELECT match nothing, then the 403 / 404 lookup
+        self.assertQueries(3, 'delete', other_path)
+        self.assertQueries(3, 'delete', '/api/article/999/')
+        # DELETE its comments, load the article for blog.signals, DELETE it
+        self.assertQueries(3, 'delete', path)
+
+    def test_article_id_comment(self):
+        path = '/api/article/{}/comment/'.format(self.article.id)
+        response = self.assertQueries(2, 'get', path)
+        self.assertQueries(1, 'get', path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertQueries(2, 'get', path, data=None, QUERY_STRING='stream=json')
+        self.assertQueries(2, 'get', '/api/article/{}/comment/'.format(self.other_article.id))
+        self.assertQueries(2, 'get', '/api/article/999/comment/')
+
+        # the article lookup, the INSERT and the UPDATE of the path (made of the new id)
+        self.assertQueries(3, 'post', path, {'content': 'new'})
+        self.assertQueries(1, 'post', '/api/article/999/comment/', {'content': 'new'})
+
+    def test_comment_id(self):
+        path = '/api/comment/{}/'.format(self.comment.id)
+        other_path = '/api/comment/{}/'.format(self.other_comment.id)
+        response = self.assertQueries(1, 'get', path)
+        self.assertQueries(1, 'get', path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertQueries(1, 'get', '/api/comment/999/')
+
+        self.assertQueries(2, 'put', path, {'content': 'new'})
+        self.assertQueries(1, 'put', other_path, {'content': 'new'})
+        self.assertQueries(1, 'put', '/api/comment/999/', {'content': 'new'})
+
+        self.assertQueries(2, 'delete', other_path)
+        self.assertQueries(2, 'delete', '/api/comment/999/')
+        # the comment's path, then one DELETE of its subtree
+        self.assertQueries(2, 'delete', path)
+
+    def test_user_listing(self):
+        path = '/api/user/{}/article/'.format(self.user.id)
+        self.assertQueries(1, 'get', path)
+        # the count is computed once, then served from the cache
+        self.assertQueries(2, 'get', path, data=None, QUERY_STRING='count')
+        self.assertQueries(1, 'get', path, data=None, QUERY_STRING='count')
+        self.assertQueries(1, 'get', '/api/user/{}/comment/'.format(self.other_user.id))
+        self.assertQueries(2, 'get', '/api/user/999/comment/')
+
+    def test_bulk(self):
+        # batches cost the same number of queries whatever their size
+        # (transactions add a SAVEPOINT and a RELEASE inside the test case's own transaction)
+        articles = [{'title': 'new', 'content': 'new'}] * 50
+        self.assertQueries(4, 'post', '/api/article/bulk/', articles)
+        articles = [{'id': self.article.id, 'title': 'new', 'content': 'new'}]
+        self.assertQueries(4, 'put', '/api/article/bulk/', articles)
+        self.assertQueries(6, 'delete', '/api/article/bulk/', [self.article.id, self.other_article.id])
+
+        self.article = Article.objects.create(title='title', content='content', author=self.user)
+        comments = [{'article': self.article.id, 'content': 'new'}] * 50
+        self.assertQueries(6, 'post', '/api/comment/bulk/', comments)
+        comment_ids = list(Comment.objects.values_list('id', flat=True))
+        self.assertQueries(4, 'put', '/api/comment/bulk/', [{'id': pk, 'content': 'new'} for pk in comment_ids])
+        self.assertQueries(4, 'delete', '/api/comment/bulk/', comment_ids)
+
+
+class SerializerTestCase(TestCase):
+
+    def test_backends(self):
+        rows = [('title', 'caf\u00e9 "quoted" \\ \n\u2028 \U0001f600', 1), ('', '', 2)]
+        expected = [{'title': title, 'content': content, 'author': author} for title, content, author in rows]
+        for backend in serializers.BACKENDS:
+            self.assertEqual(json.loads(backend.encode_rows(serializers.ARTICLE, rows)), expected)
+            self.assertEqual(json.loads(backend.encode_rows(serializers.ARTICLE, [])), [])
+            self.assertEqual(backend.loads(backend.dumps(expected)), expected)
+            self.assertEqual(backend.loads('{"a": 1}'.encode()), {'a': 1})
+            with self.assertRaises(json.JSONDecodeError):
+                backend.loads(b'{')
+
+    def test_page_body(self):
+        body = serializers.page_body(serializers.ARTICLE.encode_rows([('t', 'c', 1)]), None)
+        self.assertEqual(json.loads(body), {'results': [{'title': 't', 'content': 'c', 'author': 1}], 'next': None})
+
+
+class ProfilingTestCase(TestCase):
+
+    def test_profiling_middleware(self):
+        user = User.objects.create_user(username='chris', password='chris')
+        article = Article.objects.create(title='title', content='content', author=user)
+        Comment.objects.create(content='comment', article=article, author=user)
+        client = Client()
+        client.force_login(user)
+        path = '/api/article/{}/comment/'.format(article.id)
+
+        # off unless enabled
+        self.assertNotIn('Server-Timing', client.get(path))
+
+        with tempfile.TemporaryDirectory() as profiles, self.settings(
+                MIDDLEWARE=['blog.profiling.ProfilingMiddleware'] + settings.MIDDLEWARE,
+                BLOG_PROFILING_SAMPLE_RATE=1, BLOG_PROFILING_SLOW_MS=0, BLOG_PROFILING_DIR=profiles):
+            # a new client: handlers load their middleware once
+            client = Client()
+            client.force_login(user)
+            response = client.get(path)
+            self.assertEqual(response.status_code, 200)
+            timing = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+            self.assertEqual(set(timing), {'total', 'db', 'json', 'auth'})
+            # the session and user lookups, then the comment list's 2 queries
+            self.assertIn('desc="4 queries"', timing['db'])
+            self.assertEqual(len(os.listdir(profiles)), 1)
+
+        exposition = profiling.metrics(None).content.decode()
+        labels = 'route="api/article/<int:article_id>/comment/",method="GET"'
+        self.assertIn('blog_request_duration_seconds_count{%s} 1' % labels, exposition)
+        self.assertIn('blog_request_duration_seconds_bucket{%s,le="+Inf"} 1' % labels, exposition)
+        self.assertIn('blog_db_queries_total{%s} 4' % labels, exposition)
+
+
+class FakeConnection:
+    # the parts of a psycopg2 connection the pool touches
+    def __init__(self, broken=False):
+        self.closed, self.broken, self.rollbacks, self.queries = 0, broken, 0, 0
+        self.isolation_level = 'read committed'
+        self.info = mock.Mock(transaction_status=pool_backend.extensions.TRANSACTION_STATUS_IDLE)
+
+    def rollback(self):
+        if self.broken:
+            raise pool_backend.psycopg2.OperationalError('server closed the connection')
+        self.rollbacks += 1
+        self.info.transaction_status = pool_backend.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def cursor(self):
+        self.queries += 1
+        if self.broken:
+            raise pool_backend.psycopg2.OperationalError('server closed the connection')
+        return mock.MagicMock()
+
+
+@skipUnless(pool_backend, 'psycopg2 is not installed')
+@override_settings(BLOG_DB_HEALTH_CHECKS=False)
+class ConnectionPoolTestCase(TestCase):
+
+    def test_pool(self):
+        pool = pool_backend.ConnectionPool(2)
+
+        # an empty pool lets the caller open a connection, which comes back on release
+        self.assertIsNone(pool.acquire(1))
+        connection = FakeConnection()
+        pool.release(connection)
+        self.assertIs(pool.acquire(1), connection)
+
+        # a connection left in a transaction is rolled back; one that fails to is dropped
+        connection.info.transaction_status = pool_backend.extensions.TRANSACTION_STATUS_INTRANS
+        pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(pool.acquire(1), connection)
+        connection.info.transaction_status = pool_backend.extensions.TRANSACTION_STATUS_INERROR
+        connection.broken = True
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(list(pool.idle), [])
+
+        # closed connections are never handed out again
+        self.assertIsNone(pool.acquire(1))
+        closed = FakeConnection()
+        closed.close()
+        pool.idle.append(closed)
+        self.assertIsNone(pool.acquire(1))
+        pool.release()  # both slots
+        pool.release()
+
+    def test_pool_timeout(self):
+        pool = pool_backend.ConnectionPool(1)
+        connection = FakeConnection()
+        self.assertIsNone(pool.acquire(1))
+        with self.assertRaises(pool_backend.psycopg2.OperationalError):
+            pool.acquire(0.01)
+
+        # a waiting thread gets the connection as soon as it is released
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            waiting = executor.submit(pool.acquire, 10)
+            time.sleep(0.05)
+            self.assertFalse(waiting.done())
+            pool.release(connection)
+            self.assertIs(waiting.result(timeout=10), connection)
+        pool.release(connection)
+
+    def test_health_checks(self):
+        pool = pool_backend.ConnectionPool(1)
+        broken, healthy = FakeConnection(broken=True), FakeConnection()
+
+        # unchecked: idle connections are handed out as they are
+        pool.idle.append(broken)
+        self.assertIs(pool.acquire(1), broken)
+        self.assertEqual(broken.queries, 0)
+        pool.idle.clear()
+        pool.release()
+
+        # checked: a dead connection is closed and the next one tried
+        with self.settings(BLOG_DB_HEALTH_CHECKS=True):
+            pool.idle.extend([healthy, broken])
+            self.assertIs(pool.acquire(1), healthy)
+            self.assertTrue(broken.closed)
+            self.assertEqual(healthy.queries, 1)
+            pool.release(healthy)
+
+    def test_database_wrapper(self):
+        settings_dict = dict(connection.settings_dict, ENGINE='blog.db.postgresql', NAME='pool_test',
+                             OPTIONS={}, POOL_SIZE=1, POOL_TIMEOUT=0.01)
+        wrapper = pool_backend.DatabaseWrapper(settings_dict)
+        conn_params = {'database': 'pool_test'}
+        connections_opened = []
+
+        def connect(_, conn_params):
+            connections_opened.append(FakeConnection())
+            return connections_opened[-1]
+
+        with mock.patch.object(pool_backend.base.DatabaseWrapper, 'get_new_connection', connect):
+            # the first connection is opened, closing hands it back to the pool
+            wrapper.connection = wrapper.get_new_connection(conn_params)
+            self.assertEqual(connections_opened, [wrapper.connection])
+            with self.assertRaises(pool_backend.psycopg2.OperationalError):
+                wrapper.get_new_connection(conn_params)
+            wrapper._close()
+            self.assertFalse(wrapper.connection.closed)
+
+            # the next one reuses it, with the isolation level a new connection would have
+            wrapper.isolation_level = None
+            reused = wrapper.get_new_connection(conn_params)
+            self.assertEqual(connections_opened, [reused])
+            self.assertEqual(wrapper.isolation_level, 'read committed')
+            wrapper.connection = reused
+            wrapper._close()
+
+        # a failed connect gives its slot back: the next attempt connects again instead of timing out
+        pool_backend.get_pool(conn_params, 1).idle.clear()
+        with mock.patch.object(pool_backend.base.DatabaseWrapper, 'get_new_connection',
+                               side_effect=pool_backend.psycopg2.OperationalError('could not connect')):
+            for _ in range(2):
+                with self.assertRaisesMessage(pool_backend.psycopg2.OperationalError, 'could not connect'):
+                    wrapper.get_new_connection(conn_params)
+
+
+@override_settings(BLOG_DB_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTestCase(TestCase):
+
+    def routed(self, method, **cookies):
+        # the alias reads go to while ReplicaMiddleware handles a ``method`` request, and the response
+        databases = []
+
+        def view(request):
+            databases.append(router.db_for_read(Article))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/api/article/')
+        request.COOKIES.update(cookies)
+        response = ReplicaMiddleware(view)(request)
+        return databases[0], response
+
+    def test_replica_routing(self):
+        # safe requests read from a replica; writes always go to the primary
+        database, response = self.routed('get')
+        self.assertIn(database, ['replica1', 'replica2'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_write(Article), 'default')
+
+        # read-your-writes: an unsafe request reads from the primary and pins its client there
+        database, response = self.routed('post')
+        self.assertEqual(database, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.BLOG_REPLICA_PIN_SECONDS)
+        database, response = self.routed('get', **{PIN_COOKIE: '1'})
+        self.assertEqual(database, 'default')
+
+        # so do views that write on safe methods, like signout: its session lookup and flush
+        # stay on the primary (the replica aliases do not even exist here)
+        user = User.objects.create_user(username='chris', password='chris')
+        with self.settings(MIDDLEWARE=['blog.routers.ReplicaMiddleware'] + settings.MIDDLEWARE):
+            client = Client()
+            client.force_login(user)
+            response = client.get('/api/signout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.BLOG_REPLICA_PIN_SECONDS)
+        self.assertFalse(Session.objects.exists())
+
+        # outside requests (shell, management commands) and without replicas: the primary
+        self.assertEqual(router.db_for_read(Article), 'default')
+        with self.settings(BLOG_DB_REPLICAS=[]):
+            self.assertEqual(self.routed('get')[0], 'default')
+
+
+class CommentQueueTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        journal = os.path.join(self.directory.name, 'comments.sqlite3')
+        queue = self.settings(BLOG_COMMENT_QUEUE=journal, BLOG_COMMENT_QUEUE_INTERVAL=None)
+        queue.enable()
+        self.addCleanup(queue.disable)
+
+    def test_comment_queue(self):
+        user = User.objects.create_user(username='chris', password='chris')
+        other = User.objects.create_user(username='other', password='other')
+        article = Article.objects.create(title='title', content='content', author=user)
+        gone = Article.objects.create(title='title', content='content', author=user)
+        client = Client()
+        client.force_login(user)
+        path = '/api/article/{}/comment/'.format(article.id)
+
+        # queued: the session, the user and the article are read, nothing is written
+        with self.assertNumQueries(3):
+            response = client.post(path, json.dumps({'content': 'first'}), content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'id': None, 'article_id': article.id, 'content': 'first',
+                                           'author_id': user.id})
+        self.assertEqual(client.post(path, json.dumps({'content': 1}), content_type='application/json').status_code,
+                         400)
+        client.post('/api/article/{}/comment/'.format(gone.id), json.dumps({'content': 'lost'}),
+                    content_type='application/json')
+        self.assertFalse(Comment.objects.exists())
+
+        # pending comments are seen by their author only
+        self.assertEqual(client.get(path).json(), [{'article': article.id, 'content': 'first', 'author': user.id}])
+        self.assertEqual(client.get(path + '?fields=content&expand=author').json(),
+                         [{'content': 'first', 'author_username': 'chris'}])
+        self.assertEqual(client.get(path + '?stream=ndjson').getvalue(),
+                         b'{"article":%d,"content":"first","author":%d}\n' % (article.id, user.id))
+        reader = Client()
+        reader.force_login(other)
+        self.assertEqual(reader.get(path).json(), [])
+
+        # one flush inserts the batch, dropping the comments of deleted articles
+        gone.delete()
+        self.assertEqual(ingest.flush(), 1)
+        self.assertEqual(list(Comment.objects.values_list('article_id', 'content', 'author_id')),
+                         [(article.id, 'first', user.id)])
+        self.assertEqual(client.get(path).json(), [{'article': article.id, 'content': 'first', 'author': user.id}])
+        self.assertEqual(ingest.flush(), 0)
+
+
+class ThreadTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='chris', password='chris')
+        self.article = Article.objects.create(title='title', content='content', author=self.user)
+        self.client.force_login(self.user)
+        self.path = '/api/article/{}/comment/'.format(self.article.id)
+
+    def reply(self, content, parent=None):
+        body = {'content': content} if parent is None else {'content': content, 'parent': parent}
+        return self.client.post(self.path, json.dumps(body), content_type='application/json')
+
+    def thread(self, query):
+        response = self.client.get(self.path, data=None, QUERY_STRING=query)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [(entry['content'], entry['depth']) for entry in body['results']], body['next']
+
+    def test_threads(self):
+        a = self.reply('a').json()['id']
+        b = self.reply('b').json()['id']
+        a1 = self.reply('a1', a).json()['id']
+        response = self.reply('a1x', a1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['parent_id'], a1)
+        a2 = self.reply('a2', a).json()['id']
+        self.reply('b1', b)
+
+        # thread order: every comment followed by its replies, in one range scan per page (and the session)
+        with self.assertNumQueries(2):
+            results, cursor = self.thread('thread')
+        self.assertEqual(results, [('a', 0), ('a1', 1), ('a1x', 2), ('a2', 1), ('b', 0), ('b1', 1)])
+        self.assertIsNone(cursor)
+        entry = self.client.get(self.path + '?thread&limit=1').json()['results'][0]
+        self.assertEqual(entry, {'id': a, 'parent': None, 'depth': 0, 'article': self.article.id, 'content': 'a',
+                                 'author': self.user.id})
+        self.assertEqual(self.thread('thread&depth=0')[0], [('a', 0), ('b', 0)])
+        results, cursor = self.thread('thread&limit=4')
+        self.assertEqual(self.thread('thread&limit=4&after=' + cursor)[0], [('b', 0), ('b1', 1)])
+
+        # one subtree, depth-limited and paginated
+        self.assertEqual(self.thread('parent={}'.format(a))[0], [('a', 0), ('a1', 1), ('a1x', 2), ('a2', 1)])
+        self.assertEqual(self.thread('parent={}&depth=1'.format(a))[0], [('a', 0), ('a1', 1), ('a2', 1)])
+        results, cursor = self.thread('parent={}&limit=2'.format(a))
+        self.assertEqual(self.thread('parent={}&limit=2&after={}'.format(a, cursor))[0], [('a1x', 2), ('a2', 1)])
+        self.assertEqual(self.client.get(self.path + '?parent=999').status_code, 404)
+        for query in ('parent=x', 'parent=0', 'parent=-1', 'parent=' + '1' * 31, 'thread&depth=-1',
+                      'thread&depth=' + '1' * 31,
+                      'thread&depth={}'.format(settings.BLOG_COMMENT_MAX_DEPTH + 1)):
+            self.assertEqual(self.client.get(self.path + '?' + query).status_code, 400)
+        self.assertEqual(self.thread('thread&depth={}'.format(settings.BLOG_COMMENT_MAX_DEPTH))[0],
+                         self.thread('thread')[0])
+        self.assertEqual(self.client.get('/api/article/999/comment/?thread').status_code, 404)
+
+        # replies stay in their article, within BLOG_COMMENT_MAX_DEPTH
+        other = Article.objects.create(title='title', content='content', author=self.user)
+        other_comment = Comment.objects.create(content='other', article=other, author=self.user)
+        self.assertEqual(self.reply('x', other_comment.id).status_code, 400)
+        self.assertEqual(self.reply('x', 'a').status_code, 400)
+        with self.settings(BLOG_COMMENT_MAX_DEPTH=2):
+            self.assertEqual(self.reply('x', a1).status_code, 400)
+
+        # a DELETE takes the replies along
+        self.assertEqual(self.client.delete('/api/comment/{}/'.format(a1)).status_code, 200)
+        self.assertEqual(self.thread('thread')[0], [('a', 0), ('a2', 1), ('b', 0), ('b1', 1)])
+        response = self.client.delete('/api/comment/bulk/', json.dumps([b]), content_type='application/json')
+        self.assertEqual(response.json(), [{'status': 200}])
+        self.assertEqual(self.thread('thread')[0], [('a', 0), ('a2', 1)])
+
+        # bulk inserted comments are top-level
+        self.client.post('/api/comment/bulk/', json.dumps([{'article': self.article.id, 'content': 'c'}]),
+                         content_type='application/json')
+        self.assertEqual(self.thread('thread')[0], [('a', 0), ('a2', 1), ('c', 0)])
+
+        # the cursor holds the last comment's path: deleting that comment does not end the thread early
+        results, cursor = self.thread('thread&limit=2')
+        self.assertEqual(self.client.delete('/api/comment/{}/'.format(a2)).status_code, 200)
+        self.assertEqual(self.thread('thread&after=' + cursor)[0], [('c', 0)])
+        for bogus in (encode_cursor(a2), encode_cursor('x' * 10), '!'):
+            self.assertEqual(self.client.get(self.path + '?thread&after=' + bogus).status_code, 400)
+
+
+class DeletionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='chris', password='chris')
+        self.article = Article.objects.create(title='title', content='content', author=self.user)
+        Comment.objects.bulk_create(Comment(content=str(i), article=self.article, author=self.user)
+                                    for i in range(5))
+        self.client.force_login(self.user)
+        self.path = '/api/article/{}/'.format(self.article.id)
+
+    def test_delete_articles(self):
+        kept = Article.objects.create(title='title', content='content', author=self.user)
+        Comment.objects.create(content='kept', article=kept, author=self.user)
+        # the articles are loaded for blog.signals' receivers (cache invalidation) around one DELETE
+        self.assertEqual(self.client.get(self.path).status_code, 200)
+        with self.assertNumQueries(3):
+            self.assertEqual(deletion.delete_articles(Article.objects.filter(id=self.article.id)), 1)
+        self.assertEqual(list(Comment.objects.values_list('content', flat=True)), ['kept'])
+        self.assertEqual(self.client.get(self.path).status_code, 404)
+        # and not at all without receivers
+        other = Article.objects.create(title='title', content='content', author=self.user)
+        with mock.patch.object(post_delete, 'has_listeners', return_value=False), self.assertNumQueries(2):
+            self.assertEqual(deletion.delete_articles(Article.objects.filter(id=other.id)), 1)
+        # comment delete receivers still get their instances
+        received = []
+        receiver = lambda sender, instance, **kwargs: received.append(instance.content)
+        post_delete.connect(receiver, sender=Comment)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Comment)
+        deletion.delete_articles(Article.objects.filter(id=kept.id))
+        self.assertEqual(received, ['kept'])
+        self.assertFalse(Article.objects.exists())
+
+    @override_settings(BLOG_PURGE_ASYNC_THRESHOLD=4, BLOG_PURGE_CHUNK_SIZE=2, BLOG_PURGE_CHUNK_PAUSE=0)
+    def test_purge(self):
+        self.assertEqual(self.client.get(self.path).status_code, 200)
+        with mock.patch('blog.views.purge_later') as purge_later:
+            self.assertEqual(self.client.delete(self.path).status_code, 202)
+        purge_later.assert_called_once_with(self.article.id, self.user.id)
+
+        # DELETE the chunks of 2, 2 and 1 comments, then the article
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(deletion.purge(self.article.id), 5)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 5)
+        deletion._purge(self.article.id, self.user.id)
+        self.assertFalse(Article.objects.exists())
+        self.assertEqual(self.client.get(self.path).status_code, 404)
+
+        # short threads are still deleted by the request
+        article = Article.objects.create(title='title', content='content', author=self.user)
+        self.assertEqual(self.client.delete('/api/article/{}/'.format(article.id)).status_code, 200)
+
+
+class CompressionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='chris', password='chris')
+        Article.objects.bulk_create(Article(title='title', content='content ' * 10, author=user) for _ in range(30))
+        self.article = Article.objects.first()
+        self.client.force_login(user)
+
+    def test_compression(self):
+        plain = self.client.get('/api/article/')
+        self.assertNotIn('Content-Encoding', plain)
+
+        # compressed once: the second response comes from the cache of compressed bodies
+        with mock.patch('blog.compression.compress', wraps=compression.compress) as compress:
+            for _ in range(2):
+                response = self.client.get('/api/article/', HTTP_ACCEPT_ENCODING='deflate, gzip;q=0.5')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(response.content), plain.content)
+                self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(response['Vary'], 'Cookie, Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        response = self.client.get('/api/article/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+
+        # the cache follows the body, not the ETag: a change the ETag misses is not served stale
+        def contents():
+            response = self.client.get('/api/article/', {'fields': 'content', 'limit': 50},
+                                       HTTP_ACCEPT_ENCODING='gzip')
+            return gzip.decompress(response.content)
+
+        with mock.patch('blog.compression.compress', wraps=compression.compress) as compress:
+            self.assertNotIn(b'changed', contents())
+            Article.objects.filter(id=self.article.id).update(content='changed ' * 10)  # no signal
+            self.assertIn(b'changed', contents())
+            self.assertIn(b'changed', contents())
+        self.assertEqual(compress.call_count, 2)
+
+        # streams whatever their size, small bodies never - and those keep their strong ETag, 304s included
+        response = self.client.get('/api/article/?stream=ndjson', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 30)
+        path = '/api/article/{}/'.format(self.article.id)
+        response = self.client.get(path, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertFalse(response['ETag'].startswith('W/'))
+        etag = response['ETag']
+        response = self.client.get(path, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_negotiate(self):
+        with mock.patch.dict(compression.CODECS, {'br': None}):
+            self.assertEqual(compression.negotiate('gzip, br'), 'br')
+            self.assertEqual(compression.negotiate('br;q=0, gzip'), 'gzip')
+            self.assertEqual(compression.negotiate('*'), 'br')
+            self.assertIsNone(compression.negotiate('br;q=0, gzip; q=0.0'))
+            self.assertIsNone(compression.negotiate('identity'))
+            self.assertIsNone(compression.negotiate(''))
+
+
+class RateLimitTestCase(TestCase):
+
+    @override_settings(BLOG_RATE_LIMITS={'signin': {'ip': (2, 60)}, '*': {'user': (1, 60)}})
+    def test_rate_limits(self):
+        user = User.objects.create_user(username='chris', password='chris')
+        other = User.objects.create_user(username='other', password='other')
+        credentials = json.dumps({'username': 'chris', 'password': 'wrong'})
+        client = Client()
+
+        # per IP: the third sign in is refused before the user lookup and the password hash
+        for _ in range(2):
+            self.assertEqual(client.post('/api/signin/', credentials, content_type='application/json').status_code,
+                             401)
+        with self.assertNumQueries(0):
+            response = client.post('/api/signin/', credentials, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # another IP has its own bucket
+        response = client.post('/api/signin/', credentials, content_type='application/json', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 401)
+
+        # per session, for each route; the session is not even loaded
+        client.force_login(user)
+        self.assertEqual(client.get('/api/article/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/article/').status_code, 429)
+        self.assertEqual(client.get('/api/user/{}/article/'.format(user.id)).status_code, 200)
+        client.force_login(other)
+        self.assertEqual(client.get('/api/article/').status_code, 200)
+
+    def test_memory_store(self):
+        store = ratelimit.MemoryStore(max_keys=2)
+        with mock.patch('time.monotonic', return_value=100):
+            self.assertEqual([store.take('a', 2, 10) for _ in range(3)], [0, 0, 5])
+        # the bucket refills at 2 tokens / 10 s
+        with mock.patch('time.monotonic', return_value=105):
+            self.assertEqual(store.take('a', 2, 10), 0)
+            self.assertEqual(store.take('a', 2, 10), 5)
+            store.take('b', 2, 10)
+            store.take('c', 2, 10)
+        self.assertEqual(list(store.buckets), ['b', 'c'])
+
+    def test_cache_store(self):
+        store = ratelimit.CacheStore()
+        with mock.patch('time.time', return_value=1000.5):
+            self.assertEqual([store.take('a', 2, 10) for _ in range(2)], [0, 0])
+            self.assertEqual(store.take('a', 2, 10), 9.5)
+        # a new window
+        with mock.patch('time.time', return_value=1010):
+            self.assertEqual(store.take('a', 2, 10), 0)
+
+
+@override_settings(ROOT_URLCONF='blog.async_urls')
+class AsyncViewTestCase(TransactionTestCase):
+    # views run in worker threads with their own connections, so data must be committed
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='chris', password='chris')
+        self.article = Article.objects.create(title='title', content='content', author=self.user)
+        Comment.objects.create(content='comment', article=self.article, author=self.user)
+
+    async def test_unauthenticated(self):
+        response = await self.async_client.get('/article/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/article/bulk/')
+        self.assertEqual(response.status_code, 405)
+
+    async def test_async_views(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        path = '/article/{}/'.format(self.article.id)
+
+        responses = await asyncio.gather(*[self.async_client.get(path) for i in range(8)])
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(responses[0].json(), {'title': 'title', 'content': 'content', 'author': self.user.id})
+
+        response = await self.async_client.get('/article/{}/comment/'.format(self.article.id))
+        self.assertEqual(response.json(), [{'article': self.article.id, 'content': 'comment', 'author': self.user.id}])
+
+        # streaming bodies are encoded in the worker
+        response = await self.async_client.get('/article/?stream=ndjson')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)),
+                         {'title': 'title', 'content': 'content', 'author': self.user.id})
+
+        response = await self.async_client.delete('/comment/999/')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.delete(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await sync_to_async(Article.objects.exists)())
@@ -0,0 +1,117 @@
+"""
+Comment threads, stored as materialized paths.
+
+Comment.path holds the ids of a comment's ancestors then its own, SEGMENT
+digits each, so thread order (every comment followed by its replies, siblings
+by id) is path order and the subtree of a comment is the range of paths it
+prefixes: both are range scans of the (article, path) index, whatever the
+depth. A comment's depth is its path length in segments. The path is only
+known once the comment has an id, so inserts are followed by an UPDATE.
+"""
+from django.conf import settings
+from django.db.models import CharField, ExpressionWrapper, IntegerField, Value
+from django.db.models.functions import Cast, Length, LPad
+
+from .models import Comment
+from .pagination import MAX_CURSOR, InvalidPage, decode_text_cursor, encode_cursor, parse_page
+
+# digits per ancestor in Comment.path (ids up to 10^10)
+SEGMENT = 10
+
+# the path of a top-level comment, computed by the database
+ROOT_PATH = LPad(Cast('id', CharField()), SEGMENT, Value('0'))
+
+
+class InvalidThread(ValueError):
+    pass
+
+
+def segment(pk):
+    return str(pk).zfill(SEGMENT)
+
+
+def reply_path(parent_path, pk):
+    return parent_path + segment(pk)
+
+
+def can_reply(parent_path):
+    # whether a reply to the comment at ``parent_path`` stays within BLOG_COMMENT_MAX_DEPTH levels
+    return len(parent_path) // SEGMENT < settings.BLOG_COMMENT_MAX_DEPTH
+
+
+def subtree_end(path):
+    # the (excluded) upper bound of the paths of the subtree at ``path``: '~' sorts after any digit
+    return path + '~'
+
+
+def fill_root_paths(article_ids):
+    # the paths of top-level comments bulk inserted into ``article_ids`` (still empty), in one UPDATE
+    Comment.objects.filter(article_id__in=article_ids, path='').update(path=ROOT_PATH)
+
+
+def subtree(queryset, root_path='', depth=None):
+    """
+    The comments of ``queryset`` under ``root_path`` (the comment itself
+    included; the whole thread if empty), down to ``depth`` levels below it
+    (0: the comment only, or the top-level comments), annotated with their
+    ``depth`` (top-level comments: 0).
+    """
+    queryset = queryset.annotate(depth=ExpressionWrapper(Length('path') / SEGMENT - 1, output_field=IntegerField()))
+    if root_path:
+        queryset = queryset.filter(path__gte=root_path, path__lt=subtree_end(root_path))
+    if depth is not None:
+        queryset = queryset.annotate(path_length=Length('path')) \
+            .filter(path_length__lte=len(root_path) + (depth + (not root_path)) * SEGMENT)
+    return queryset
+
+
+def decode_path_cursor(cursor):
+    # the path a thread cursor holds; raises InvalidPage on bad input
+    path = decode_text_cursor(cursor)
+    if not path.isdigit() or len(path) % SEGMENT:
+        raise InvalidPage(cursor)
+    return path
+
+
+def paginate_thread(queryset, params, *fields):
+    """
+    Keyset pagination in thread order: the cursor is the path of the last
+    comment, where the next page's range scan starts - whether that comment
+    is still there or not. Returns the page rows and the next cursor, like
+    blog.pagination.paginate.
+    """
+    limit, after = parse_page(params, decode_path_cursor)
+    if after:
+        queryset = queryset.filter(path__gt=after)
+    rows = list(queryset.order_by('path').values_list('path', *fields)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        del rows[limit:]
+        next_cursor = encode_cursor(rows[-1][0])
+    return [row[1:] for row in rows], next_cursor
+
+
+def parse_parent(params):
+    # ?parent= as a comment id, None without it; raises InvalidThread on bad input
+    if 'parent' not in params:
+        return None
+    try:
+        parent = int(params['parent'])
+    except ValueError as e:
+        raise InvalidThread(params['parent']) from e
+    if not 1 <= parent <= MAX_CURSOR:
+        raise InvalidThread(parent)
+    return parent
+
+
+def parse_depth(params):
+    # ?depth= as an int up to BLOG_COMMENT_MAX_DEPTH, None without it; raises InvalidThread on bad input
+    if 'depth' not in params:
+        return None
+    try:
+        depth = int(params['depth'])
+    except ValueError as e:
+        raise InvalidThread(params['depth']) from e
+    if not 0 <= depth <= settings.BLOG_COMMENT_MAX_DEPTH:
+        raise InvalidThread(depth)
+    return depth
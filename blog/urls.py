@@ -7,7 +7,12 @@ urlpatterns = [
     path('signin/', views.signin, name='signin'),
     path('signout/', views.signout, name='signout'),
     path('article/', views.article, name='article'),
+    path('article/bulk/', views.article_bulk, name='article_bulk'),
+    path('article/search/', views.article_search, name='article_search'),
     path('article/<int:article_id>/', views.article_id, name='article_id'),
     path('article/<int:article_id>/comment/', views.article_id_comment, name='article_id_comment'),
+    path('comment/bulk/', views.comment_bulk, name='comment_bulk'),
     path('comment/<int:comment_id>/', views.comment_id, name='comment_id'),
+    path('user/<int:user_id>/article/', views.user_article, name='user_article'),
+    path('user/<int:user_id>/comment/', views.user_comment, name='user_comment'),
 ]
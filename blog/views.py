@@ -1,18 +1,35 @@
+from itertools import chain
+from django.conf import settings
 from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseBadRequest, HttpResponseForbidden, \
-    HttpResponseNotFound, JsonResponse
+    HttpResponseNotFound
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.contrib.auth import authenticate, login, logout
-import json
+from django.db import transaction
+from django.utils import timezone
 from json import JSONDecodeError
 from .models import Article, Comment
-from django.core.exceptions import ObjectDoesNotExist
+from .bulk import BadBatch, bulk_insert, check_owned, item_id, item_values, load_batch
+from .cache import get_article, get_author_count, get_listing, get_listing_page, get_listing_summary, \
+    invalidate_article, invalidate_articles, invalidate_author_count, invalidate_author_counts
+from .conditional import collection_etag, not_modified, resource_validators, set_validators
+from .deletion import delete_articles, delete_subtrees, is_large_thread, purge_later
+from .ingest import enqueue, pending_rows
+from .projection import InvalidFields, expanded, parse_fields
+from .pagination import InvalidPage, encode_cursor, paginate, parse_page, wants_page
+from .routers import writes
+from .search import search_articles
+from .serializers import ARTICLE, ARTICLE_ENTRY, COMMENT, COMMENT_ENTRY, THREAD_ENTRY, dumps, encoded_response, \
+    json_response, loads, page_body
+from .streaming import iterate, streaming_response, wants_stream
+from .threads import InvalidThread, can_reply, fill_root_paths, paginate_thread, parse_depth, parse_parent, subtree
+from .summaries import InvalidInclude, annotate_summary, parse_include, summary_fields, summary_of
 
 
 def signup(request):
     if request.method == 'POST':
         try:
-            req_data = json.loads(request.body.decode())
+            req_data = loads(request.body)
             username = req_data['username']
             password = req_data['password']
         except (KeyError, JSONDecodeError) as e:
@@ -27,7 +44,7 @@ def signup(request):
 def signin(request):
     if request.method == 'POST':
         try:
-            req_data = json.loads(request.body.decode())
+            req_data = loads(request.body)
             username = req_data['username']
             password = req_data['password']
         except (KeyError, JSONDecodeError) as e:
@@ -44,6 +61,7 @@ def signin(request):
         return HttpResponseNotAllowed(['POST'])
 
 
+@writes
 def signout(request):
     if request.method == 'GET':
         if not_authenticated(request): return HttpResponse(status=401)
@@ -56,80 +74,163 @@ def signout(request):
 def article(request):
     if request.method == 'GET':
         if not_authenticated(request): return HttpResponse(status=401)
-        article_list = [{'title': article['title'], 'content': article['content'], 'author': article['author_id']} for
-                        article in Article.objects.all().values('title', 'content', 'author_id')]
-        return JsonResponse(article_list, safe=False)
+        try:
+            include = parse_include(request.GET)
+            schema = parse_fields(request.GET, ARTICLE)
+        except (InvalidInclude, InvalidFields) as e:
+            return HttpResponseBadRequest()
+        articles = annotate_summary(Article.objects.all(), include)
+        fields = schema.columns + summary_fields(include)
+
+        def article_dict(row):
+            return dict(schema.as_dict(row), **summary_of(dict(zip(fields, row)), include))
+
+        def encode(rows):
+            return dumps([article_dict(row) for row in rows]) if include else schema.encode_rows(rows)
+
+        if wants_stream(request.GET):
+            rows = iterate(articles.order_by('id').values_list(*fields))
+            response = streaming_response(map(article_dict, rows), request.GET['stream'])
+            return response if response is not None else HttpResponseBadRequest()
+
+        # comment summaries and authors' usernames are not covered by the article validators
+        etag = None if include or expanded(schema) else get_listing_summary()[0]
+        if etag is not None:
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+        # the plain listing is stitched from cached blocks of encoded entries
+        cached = not include and schema is ARTICLE
+        if wants_page(request.GET):
+            try:
+                if cached:
+                    limit, after = parse_page(request.GET)
+                    results, last = get_listing_page(after, limit)
+                    next_cursor = None if last is None else encode_cursor(last)
+                else:
+                    rows, next_cursor = paginate(articles, request.GET, *fields)
+                    results = encode(rows)
+            except InvalidPage as e:
+                return HttpResponseBadRequest()
+            response = encoded_response(page_body(results, next_cursor))
+        else:
+            response = encoded_response(get_listing() if cached else encode(articles.values_list(*fields)))
+        return response if etag is None else set_validators(response, etag)
 
     elif request.method == 'POST':
         if not_authenticated(request): return HttpResponse(status=401)
         try:
-            req_data = json.loads(request.body.decode())
+            req_data = loads(request.body)
             article_title = req_data['title']
             article_content = req_data['content']
         except (KeyError, JSONDecodeError) as e:
             return HttpResponseBadRequest()
-        article = Article(title=article_title, content=article_content, author=request.user)
+        article = Article(title=article_title, content=article_content, author_id=request.user.id)
         article.save()
+        invalidate_author_count(Article, request.user.id)
         response_dict = {'id': article.id, 'title': article.title, 'content': article.content,
-                         'author_id': article.author.id}
+                         'author_id': article.author_id}
 
-        return JsonResponse(response_dict, status=201)
+        return json_response(response_dict, status=201)
     else:
         return HttpResponseNotAllowed(['GET', 'POST'])
 
 
+def article_search(request):
+    if request.method == 'GET':
+        if not_authenticated(request): return HttpResponse(status=401)
+        query = request.GET.get('q', '').strip()
+        try:
+            # ranked results are paged by offset: the cursor holds the offset of the next page
+            limit, offset = parse_page(request.GET)
+            schema = parse_fields(request.GET, ARTICLE_ENTRY)
+        except (InvalidPage, InvalidFields) as e:
+            return HttpResponseBadRequest()
+        if not query:
+            return HttpResponseBadRequest()
+
+        rows = search_articles(query, schema.columns, limit + 1, offset)
+        next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+        return encoded_response(page_body(schema.encode_rows(rows[:limit]), next_cursor))
+
+    else:
+        return HttpResponseNotAllowed(['GET'])
+
+
 def article_id(request, article_id):
     if request.method == 'GET':
         if not_authenticated(request): return HttpResponse(status=401)
 
-        # 404 : non-existing article
         try:
-            article = Article.objects.get(id=article_id)
-        except ObjectDoesNotExist as e:
+            include = parse_include(request.GET)
+            schema = parse_fields(request.GET, ARTICLE)
+        except (InvalidInclude, InvalidFields) as e:
+            return HttpResponseBadRequest()
+        if include:
+            # comment summaries change with every comment: not cached
+            # 404 : non-existing article
+            fields = schema.columns + summary_fields(include)
+            article = annotate_summary(Article.objects.filter(id=article_id), include).values_list(*fields).first()
+            if article is None:
+                return HttpResponseNotFound()
+            response_dict = dict(schema.as_dict(article), **summary_of(dict(zip(fields, article)), include))
+            return json_response(response_dict)
+        if schema is not ARTICLE:
+            # projections only SELECT their own columns: not cached
+            # 404 : non-existing article
+            article = Article.objects.filter(id=article_id).values_list(*schema.columns, 'updated_at').first()
+            if article is None:
+                return HttpResponseNotFound()
+            if expanded(schema):
+                # the author's username is not covered by the article's validators
+                return json_response(schema.as_dict(article))
+            etag, last_modified = resource_validators(article_id, article[-1])
+            return not_modified(request, etag, last_modified) or \
+                set_validators(json_response(schema.as_dict(article)), etag, last_modified)
+
+        # 404 : non-existing article
+        entry = get_article(article_id)
+        if entry is None:
             return HttpResponseNotFound()
 
-        response_dict = {"title": article.title, "content": article.content, "author": article.author.id}
-        return JsonResponse(response_dict)
+        body, etag, last_modified = entry
+        return not_modified(request, etag, last_modified) or \
+            set_validators(encoded_response(body), etag, last_modified)
 
     elif request.method == 'PUT':
         if not_authenticated(request): return HttpResponse(status=401)
         try:
-            req_data = json.loads(request.body.decode())
+            req_data = loads(request.body)
             new_article_title = req_data['title']
             new_article_content = req_data['content']
         except (KeyError, JSONDecodeError) as e:
             return HttpResponseBadRequest()
 
-        # 404 : non-existing article
-        try:
-            article = Article.objects.get(id=article_id)
-        except ObjectDoesNotExist as e:
-            return HttpResponseNotFound()
-        # 403 : non-author
-        if not article.author.id == request.user.id:
-            return HttpResponseForbidden()
-
-        article.title = new_article_title
-        article.content = new_article_content
-        article.save()
+        # conditional UPDATE: only the author's own article matches
+        if not Article.objects.filter(id=article_id, author_id=request.user.id) \
+                .update(title=new_article_title, content=new_article_content, updated_at=timezone.now()):
+            return not_found_or_forbidden(Article, article_id)
+        invalidate_article(article_id)
 
-        response_dict = {'id': article.id, 'title': article.title, 'content': article.content,
-                         'author_id': article.author.id}
-        return JsonResponse(response_dict, status=200)
+        response_dict = {'id': article_id, 'title': new_article_title, 'content': new_article_content,
+                         'author_id': request.user.id}
+        return json_response(response_dict, status=200)
 
     elif request.method == 'DELETE':
         if not_authenticated(request): return HttpResponse(status=401)
 
-        # 404 : non-existing article
-        try:
-            article = Article.objects.get(id=article_id)
-        except ObjectDoesNotExist as e:
-            return HttpResponseNotFound()
-        # 403 : non-author
-        if not article.author.id == request.user.id:
-            return HttpResponseForbidden()
-
-        article.delete()
+        # conditional DELETE: only the author's own article (and its comments) matches
+        articles = Article.objects.filter(id=article_id, author_id=request.user.id)
+        if is_large_thread(article_id) and articles.exists():
+            # 202 : long threads are purged in the background, chunk by chunk
+            purge_later(article_id, request.user.id)
+            return HttpResponse(status=202)
+        # the caches are invalidated by blog.signals
+        deleted = delete_articles(articles)
+        if not deleted:
+            return not_found_or_forbidden(Article, article_id)
+        invalidate_author_counts(request.user.id)
         return HttpResponse(status=200)
 
     else:
@@ -139,36 +240,83 @@ def article_id(request, article_id):
 def article_id_comment(request, article_id):
     if request.method == 'GET':
         if not_authenticated(request): return HttpResponse(status=401)
-
-        # 404 : non-existing article
+        if 'thread' in request.GET or 'parent' in request.GET:
+            return thread_page(request, article_id)
         try:
-            article = Article.objects.get(id=article_id)
-        except ObjectDoesNotExist as e:
+            schema = parse_fields(request.GET, COMMENT)
+        except InvalidFields as e:
+            return HttpResponseBadRequest()
+
+        comments = Comment.objects.filter(article_id=article_id).order_by('id').values_list(*schema.columns)
+        # the user's own comments still waiting in the write-behind queue come last
+        queued = pending_rows(schema, article_id, request.user) if settings.BLOG_COMMENT_QUEUE else []
+        if wants_stream(request.GET):
+            # 404 : non-existing article
+            if not Article.objects.filter(id=article_id).exists():
+                return HttpResponseNotFound()
+            response = streaming_response(map(schema.as_dict, chain(iterate(comments), queued)),
+                                          request.GET['stream'])
+            return response if response is not None else HttpResponseBadRequest()
+
+        if queued or expanded(schema):
+            # no validators: they only cover inserted comments, and not the authors' usernames
+            comment_list = list(comments)
+            # 404 : non-existing article (only worth asking when it has no comments)
+            if not comment_list and not queued and not Article.objects.filter(id=article_id).exists():
+                return HttpResponseNotFound()
+            return encoded_response(schema.encode_rows(comment_list + queued))
+
+        etag, count = collection_etag(Comment.objects.filter(article_id=article_id))
+        # 404 : non-existing article (only worth asking when it has no comments)
+        if not count and not Article.objects.filter(id=article_id).exists():
             return HttpResponseNotFound()
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
-        comment_list = [{"article": comment["article_id"], "content": comment["content"], "author": comment["author_id"]} for comment in article.comments.values()]
-        return JsonResponse(comment_list, safe=False)
+        comment_list = list(comments) if count else []
+        return set_validators(encoded_response(schema.encode_rows(comment_list)), etag)
 
     elif request.method == 'POST':
         if not_authenticated(request): return HttpResponse(status=401)
         try:
-            req_data = json.loads(request.body.decode())
+            req_data = loads(request.body)
             comment_content = req_data['content']
+            parent_id = req_data.get('parent')
         except (KeyError, JSONDecodeError) as e:
             return HttpResponseBadRequest()
 
+        parent = None
+        if parent_id is not None:
+            # a reply: to a comment of the same article, within BLOG_COMMENT_MAX_DEPTH
+            parent = Comment.objects.only('path').filter(id=item_id(parent_id), article_id=article_id).first() \
+                if item_id(parent_id) is not None else None
+            if parent is None or not can_reply(parent.path):
+                # 404 : non-existing article
+                if not Article.objects.filter(id=article_id).exists():
+                    return HttpResponseNotFound()
+                return HttpResponseBadRequest()
+
         # 404 : non-existing article
-        try:
-            article = Article.objects.get(id=article_id)
-        except ObjectDoesNotExist as e:
+        elif not Article.objects.filter(id=article_id).exists():
             return HttpResponseNotFound()
 
-        comment = Comment(content=comment_content, article=article, author=request.user)
+        # replies skip the queue: their path needs their parent's
+        if settings.BLOG_COMMENT_QUEUE and parent is None:
+            if not isinstance(comment_content, str):
+                return HttpResponseBadRequest()
+            # 202 : queued, inserted by the blog.ingest worker (no id yet)
+            enqueue(article_id, request.user.id, comment_content)
+            return json_response({'id': None, 'article_id': article_id, 'content': comment_content,
+                                  'author_id': request.user.id}, status=202)
+
+        comment = Comment(content=comment_content, article_id=article_id, author_id=request.user.id, parent=parent)
         comment.save()
-        response_dict = {'id': comment.id, 'article_id': comment.article.id, 'content': comment.content,
-                         'author_id': comment.author.id}
+        invalidate_author_count(Comment, request.user.id)
+        response_dict = {'id': comment.id, 'article_id': comment.article_id, 'content': comment.content,
+                         'author_id': comment.author_id, 'parent_id': comment.parent_id}
 
-        return JsonResponse(response_dict, status=201)
+        return json_response(response_dict, status=201)
 
     else:
         return HttpResponseNotAllowed(['GET', 'POST'])
@@ -177,59 +325,218 @@ def article_id_comment(request, article_id):
 def comment_id(request, comment_id):
     if request.method == 'GET':
         if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            schema = parse_fields(request.GET, COMMENT)
+        except InvalidFields as e:
+            return HttpResponseBadRequest()
 
         # 404 : non-existing comment
-        try:
-            comment = Comment.objects.get(id=comment_id)
-        except ObjectDoesNotExist as e:
+        comment = Comment.objects.filter(id=comment_id).values_list(*schema.columns, 'updated_at').first()
+        if comment is None:
             return HttpResponseNotFound()
+        if expanded(schema):
+            # the author's username is not covered by the comment's validators
+            return json_response(schema.as_dict(comment))
 
-        response_dict = {"article": comment.article_id, "content": comment.content, "author": comment.author_id}
-        return JsonResponse(response_dict)
+        etag, last_modified = resource_validators(comment_id, comment[-1])
+        return not_modified(request, etag, last_modified) or \
+            set_validators(json_response(schema.as_dict(comment)), etag, last_modified)
 
     elif request.method == 'PUT':
         if not_authenticated(request): return HttpResponse(status=401)
         try:
-            req_data = json.loads(request.body.decode())
+            req_data = loads(request.body)
             new_comment_content = req_data['content']
         except (KeyError, JSONDecodeError) as e:
             return HttpResponseBadRequest()
 
         # 404 : non-existing comment
-        try:
-            comment = Comment.objects.get(id=comment_id)
-        except ObjectDoesNotExist as e:
+        comment = Comment.objects.filter(id=comment_id).values_list('article_id', 'author_id').first()
+        if comment is None:
             return HttpResponseNotFound()
+        comment_article_id, comment_author_id = comment
         # 403 : non-author
-        if not comment.author.id == request.user.id:
+        if not comment_author_id == request.user.id:
             return HttpResponseForbidden()
 
-        comment.content = new_comment_content
-        comment.save()
+        Comment.objects.filter(id=comment_id).update(content=new_comment_content, updated_at=timezone.now())
 
-        response_dict = {'id': comment.id, 'article_id': comment.article_id, 'content': comment.content,
-                         'author_id': comment.author.id}
-        return JsonResponse(response_dict, status=200)
+        response_dict = {'id': comment_id, 'article_id': comment_article_id, 'content': new_comment_content,
+                         'author_id': comment_author_id}
+        return json_response(response_dict, status=200)
 
     elif request.method == 'DELETE':
         if not_authenticated(request): return HttpResponse(status=401)
 
-        # 404 : non-existing comment
-        try:
-            comment = Comment.objects.get(id=comment_id)
-        except ObjectDoesNotExist as e:
-            return HttpResponseNotFound()
-        # 403 : non-author
-        if not comment.author.id == request.user.id:
-            return HttpResponseForbidden()
-
-        comment.delete()
+        # conditional DELETE: only the author's own comment (and its replies) matches
+        comment = Comment.objects.filter(id=comment_id, author_id=request.user.id) \
+            .values_list('id', 'article_id', 'path').first()
+        if comment is None:
+            return not_found_or_forbidden(Comment, comment_id)
+        delete_subtrees([comment])
+        invalidate_author_count(Comment, request.user.id)
         return HttpResponse(status=200)
 
     else:
         return HttpResponseNotAllowed(['GET', 'PUT', 'DELETE'])
 
 
+def article_bulk(request):
+    if request.method == 'POST':
+        if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            items = load_batch(request)
+        except (BadBatch, JSONDecodeError) as e:
+            return HttpResponseBadRequest()
+
+        results = [{'status': 400}] * len(items)
+        created = []
+        for i, item in enumerate(items):
+            values = item_values(item, Article, 'title', 'content')
+            if values is not None:
+                created.append((i, Article(title=values[0], content=values[1], author_id=request.user.id)))
+        with transaction.atomic():
+            bulk_insert(Article, [article for i, article in created], request.user.id)
+        invalidate_articles([article.id for i, article in created])
+        invalidate_author_count(Article, request.user.id)
+
+        for i, article in created:
+            results[i] = {'status': 201, 'id': article.id, 'title': article.title, 'content': article.content,
+                          'author_id': article.author_id}
+        return json_response(results)
+
+    elif request.method == 'PUT':
+        if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            items = load_batch(request)
+        except (BadBatch, JSONDecodeError) as e:
+            return HttpResponseBadRequest()
+
+        values = [item_values(item, Article, 'id', 'title', 'content') or (None, None, None) for item in items]
+        with transaction.atomic():
+            statuses, rows = check_owned(Article, [item_id(pk) for pk, title, content in values], request.user.id)
+            now = timezone.now()
+            updated = [Article(id=pk, title=title, content=content, author_id=request.user.id, updated_at=now)
+                       for (pk, title, content), status in zip(values, statuses) if status == 200]
+            Article.objects.bulk_update(updated, ['title', 'content', 'updated_at'])
+        invalidate_articles([article.id for article in updated])
+
+        results = [{'status': status} for status in statuses]
+        for (pk, title, content), result in zip(values, results):
+            if result['status'] == 200:
+                result.update({'id': pk, 'title': title, 'content': content, 'author_id': request.user.id})
+        return json_response(results)
+
+    elif request.method == 'DELETE':
+        if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            items = load_batch(request)
+        except (BadBatch, JSONDecodeError) as e:
+            return HttpResponseBadRequest()
+
+        ids = [item_id(item) for item in items]
+        with transaction.atomic():
+            statuses, rows = check_owned(Article, ids, request.user.id)
+            deleted = [pk for pk, status in zip(ids, statuses) if status == 200]
+            delete_articles(Article.objects.filter(id__in=deleted))
+        invalidate_author_counts(request.user.id)
+
+        return json_response([{'status': status} for status in statuses])
+
+    else:
+        return HttpResponseNotAllowed(['POST', 'PUT', 'DELETE'])
+
+
+def comment_bulk(request):
+    if request.method == 'POST':
+        if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            items = load_batch(request)
+        except (BadBatch, JSONDecodeError) as e:
+            return HttpResponseBadRequest()
+
+        values = [item_values(item, Comment, 'article', 'content') or (None, None) for item in items]
+        results = [{'status': 400}] * len(items)
+        created = []
+        with transaction.atomic():
+            # 404 : non-existing articles, all checked in one query
+            article_ids = {item_id(article) for article, content in values} - {None}
+            existing = set(Article.objects.filter(id__in=article_ids).values_list('id', flat=True))
+            for i, (article, content) in enumerate(values):
+                if item_id(article) is None:
+                    continue
+                if article not in existing:
+                    results[i] = {'status': 404}
+                    continue
+                created.append((i, Comment(content=content, article_id=article, author_id=request.user.id)))
+            bulk_insert(Comment, [comment for i, comment in created], request.user.id)
+            fill_root_paths({comment.article_id for i, comment in created})
+        invalidate_author_count(Comment, request.user.id)
+
+        for i, comment in created:
+            results[i] = {'status': 201, 'id': comment.id, 'article_id': comment.article_id,
+                          'content': comment.content, 'author_id': comment.author_id}
+        return json_response(results)
+
+    elif request.method == 'PUT':
+        if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            items = load_batch(request)
+        except (BadBatch, JSONDecodeError) as e:
+            return HttpResponseBadRequest()
+
+        values = [item_values(item, Comment, 'id', 'content') or (None, None) for item in items]
+        with transaction.atomic():
+            statuses, rows = check_owned(Comment, [item_id(pk) for pk, content in values], request.user.id,
+                                         'article_id')
+            now = timezone.now()
+            updated = [Comment(id=pk, content=content, updated_at=now)
+                       for (pk, content), status in zip(values, statuses) if status == 200]
+            Comment.objects.bulk_update(updated, ['content', 'updated_at'])
+
+        results = [{'status': status} for status in statuses]
+        for (pk, content), result in zip(values, results):
+            if result['status'] == 200:
+                result.update({'id': pk, 'article_id': rows[pk]['article_id'], 'content': content,
+                               'author_id': request.user.id})
+        return json_response(results)
+
+    elif request.method == 'DELETE':
+        if not_authenticated(request): return HttpResponse(status=401)
+        try:
+            items = load_batch(request)
+        except (BadBatch, JSONDecodeError) as e:
+            return HttpResponseBadRequest()
+
+        ids = [item_id(item) for item in items]
+        with transaction.atomic():
+            statuses, rows = check_owned(Comment, ids, request.user.id, 'article_id', 'path')
+            delete_subtrees([(pk, rows[pk]['article_id'], rows[pk]['path'])
+                             for pk, status in zip(ids, statuses) if status == 200])
+        invalidate_author_count(Comment, request.user.id)
+
+        return json_response([{'status': status} for status in statuses])
+
+    else:
+        return HttpResponseNotAllowed(['POST', 'PUT', 'DELETE'])
+
+
+def user_article(request, user_id):
+    if request.method == 'GET':
+        if not_authenticated(request): return HttpResponse(status=401)
+        return author_page(request, Article, ARTICLE_ENTRY, user_id)
+    else:
+        return HttpResponseNotAllowed(['GET'])
+
+
+def user_comment(request, user_id):
+    if request.method == 'GET':
+        if not_authenticated(request): return HttpResponse(status=401)
+        return author_page(request, Comment, COMMENT_ENTRY, user_id)
+    else:
+        return HttpResponseNotAllowed(['GET'])
+
+
 @ensure_csrf_cookie
 def token(request):
     if request.method == 'GET':
@@ -240,3 +547,46 @@ def token(request):
 
 def not_authenticated(request):
     return not request.user.is_authenticated
+
+
+def author_page(request, model, schema, user_id):
+    # one range scan of the (author, id) index per page; ?count adds the author's cached total
+    try:
+        schema = parse_fields(request.GET, schema)
+        rows, next_cursor = paginate(model.objects.filter(author_id=user_id), request.GET, *schema.columns)
+    except (InvalidPage, InvalidFields) as e:
+        return HttpResponseBadRequest()
+    # 404 : non-existing user (only worth asking when the page is empty)
+    if not rows and not User.objects.filter(id=user_id).exists():
+        return HttpResponseNotFound()
+    count = get_author_count(model, user_id) if 'count' in request.GET else None
+    return encoded_response(page_body(schema.encode_rows(rows), next_cursor, count))
+
+
+def thread_page(request, article_id):
+    # ?thread: the article's comments in thread order; ?parent=<id>: one subtree; ?depth=: levels below
+    try:
+        schema = parse_fields(request.GET, THREAD_ENTRY)
+        parent_id, depth = parse_parent(request.GET), parse_depth(request.GET)
+        root_path = ''
+        if parent_id is not None:
+            root_path = Comment.objects.filter(id=parent_id, article_id=article_id) \
+                .values_list('path', flat=True).first()
+            # 404 : non-existing comment (or one of another article)
+            if root_path is None:
+                return HttpResponseNotFound()
+        rows, next_cursor = paginate_thread(subtree(Comment.objects.filter(article_id=article_id), root_path, depth),
+                                            request.GET, *schema.columns)
+    except (InvalidPage, InvalidFields, InvalidThread) as e:
+        return HttpResponseBadRequest()
+    # 404 : non-existing article (only worth asking when the page is empty)
+    if not rows and not root_path and not Article.objects.filter(id=article_id).exists():
+        return HttpResponseNotFound()
+    return encoded_response(page_body(schema.encode_rows(rows), next_cursor))
+
+
+def not_found_or_forbidden(model, pk):
+    # a conditional write on (id, author_id) matched nothing: 403 if the row exists, 404 otherwise
+    if model.objects.filter(id=pk).exists():
+        return HttpResponseForbidden()
+    return HttpResponseNotFound()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blog.compression.CompressionMiddleware',
+    'blog.ratelimit.RateLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,15 +76,127 @@ WSGI_APPLICATION = 'myblog.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+# BLOG_DB_ENGINE=postgresql switches to PostgreSQL (BLOG_DB_NAME, BLOG_DB_USER, BLOG_DB_PASSWORD,
+# BLOG_DB_HOST, BLOG_DB_PORT). Its connections are persistent (BLOG_DB_CONN_MAX_AGE seconds) or,
+# with BLOG_DB_POOL_SIZE > 0, drawn from a per-process pool and handed back after each request.
+
+BLOG_DB_ENGINE = os.environ.get('BLOG_DB_ENGINE', 'sqlite')
+
+BLOG_DB_POOL_SIZE = int(os.environ.get('BLOG_DB_POOL_SIZE', 0))
+
+if BLOG_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'blog.db.postgresql' if BLOG_DB_POOL_SIZE else 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BLOG_DB_NAME', 'myblog'),
+            'USER': os.environ.get('BLOG_DB_USER', ''),
+            'PASSWORD': os.environ.get('BLOG_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BLOG_DB_HOST', ''),
+            'PORT': os.environ.get('BLOG_DB_PORT', ''),
+            'CONN_MAX_AGE': 0 if BLOG_DB_POOL_SIZE else int(os.environ.get('BLOG_DB_CONN_MAX_AGE', 60)),
+            'POOL_SIZE': BLOG_DB_POOL_SIZE,
+            'POOL_TIMEOUT': 10,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BLOG_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('BLOG_DB_CONN_MAX_AGE', 0)),
+            'OPTIONS': {
+                # seconds a writer waits for the file lock before "database is locked"
+                'timeout': 20,
+            },
+        }
+    }
+
+# Read replicas: BLOG_DB_REPLICAS lists their hosts (PostgreSQL) or files (SQLite), comma-separated.
+# They become the aliases replica1, replica2, ... that blog.routers reads from on safe requests.
+
+BLOG_DB_REPLICAS = []
+
+for i, replica in enumerate(filter(None, os.environ.get('BLOG_DB_REPLICAS', '').split(','))):
+    BLOG_DB_REPLICAS.append('replica{}'.format(i + 1))
+    DATABASES[BLOG_DB_REPLICAS[-1]] = dict(DATABASES['default'], **{
+        'HOST' if BLOG_DB_ENGINE == 'postgresql' else 'NAME': replica,
+        'TEST': {'MIRROR': 'default'},
+    })
+
+DATABASE_ROUTERS = ['blog.routers.ReplicaRouter']
+
+if BLOG_DB_REPLICAS:
+    MIDDLEWARE.insert(0, 'blog.routers.ReplicaMiddleware')
+
+# Seconds a client reads from the primary after a write (longer than the replication lag)
+
+BLOG_REPLICA_PIN_SECONDS = 5
+
+# Check reused connections at the start of each request (Django 3.1 has no CONN_HEALTH_CHECKS)
+
+BLOG_DB_HEALTH_CHECKS = os.environ.get(
+    'BLOG_DB_HEALTH_CHECKS', '1' if DATABASES['default']['CONN_MAX_AGE'] or BLOG_DB_POOL_SIZE else '0') == '1'
 
-DATABASES = {
+# Applied to every new SQLite connection: readers no longer block the writer (and the other
+# way round) in WAL mode, and NORMAL sync is safe with WAL
+
+BLOG_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -20000,
+    'temp_store': 'memory',
+    'mmap_size': 268435456,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'myblog',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
 
+# Authentication
+# https://docs.djangoproject.com/en/3.1/topics/auth/customizing/
+
+AUTHENTICATION_BACKENDS = ['blog.backends.CachedModelBackend']
+
+# The first hasher hashes new passwords; the others only verify old hashes
+PASSWORD_HASHERS = [
+    'blog.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Sessions live in the database. With BLOG_SESSION_CACHE_LOCATION (a memcached server every worker
+# shares) they are read from that cache and written through (cached_db); never from the per-process
+# LocMem cache, where a signout in one worker leaves the session signed in for the others
+# (blog.checks refuses that)
+
+BLOG_SESSION_CACHE_LOCATION = os.environ.get('BLOG_SESSION_CACHE_LOCATION')
+
+if BLOG_SESSION_CACHE_LOCATION:
+    CACHES['sessions'] = {
+        'BACKEND': os.environ.get('BLOG_SESSION_CACHE_BACKEND', 'django.core.cache.backends.memcached.PyLibMCCache'),
+        'LOCATION': BLOG_SESSION_CACHE_LOCATION,
+    }
+    SESSION_CACHE_ALIAS = 'sessions'
+
+SESSION_ENGINE = os.environ.get('BLOG_SESSION_ENGINE', 'django.contrib.sessions.backends.{}'.format(
+    'cached_db' if BLOG_SESSION_CACHE_LOCATION else 'db'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -119,3 +234,127 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Blog API
+# Keyset pagination of listings (?limit=&after=)
+
+BLOG_PAGE_SIZE = 20
+
+BLOG_MAX_PAGE_SIZE = 100
+
+# Rows fetched per round trip by streaming exports (?stream=json|ndjson)
+
+BLOG_STREAM_CHUNK_SIZE = 2000
+
+# Cache alias and TTL (seconds) of the article read-through cache
+
+BLOG_CACHE = 'default'
+
+BLOG_ARTICLE_CACHE_TIMEOUT = 300
+
+# Consecutive article ids per cached block of the article listing (blog.cache)
+
+BLOG_ARTICLE_LISTING_BLOCK = 100
+
+# TTL (seconds) of the per-author counts of /api/user/<id>/article/ and comment/ (?count)
+
+BLOG_AUTHOR_COUNT_CACHE_TIMEOUT = 60
+
+# Largest batch accepted by the bulk endpoints (article/bulk/, comment/bulk/)
+
+BLOG_BULK_MAX_ITEMS = 1000
+
+# Route the article and comment endpoints to blog.async_views (set by myblog/asgi.py)
+
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS') == '1'
+
+# PBKDF2 iterations of new and rehashed passwords (Django 3.1 default: 216000)
+
+BLOG_PASSWORD_ITERATIONS = int(os.environ.get('BLOG_PASSWORD_ITERATIONS', 216000))
+
+# Seconds a resolved user is served from the cache by blog.backends.CachedModelBackend
+
+BLOG_USER_CACHE_TIMEOUT = 5
+
+# Token buckets of blog.ratelimit, for each URL name ('*': the other routes): (requests, seconds)
+# per client IP ('ip') and per session cookie ('user'); the IP budget covers everyone behind a NAT.
+# BLOG_RATE_LIMITING=0 turns them off (servers under manage.py bench load --server)
+
+BLOG_RATE_LIMITS = {} if os.environ.get('BLOG_RATE_LIMITING') == '0' else {
+    'signup': {'ip': (10, 3600)},
+    'signin': {'ip': (30, 60)},
+    'token': {'ip': (120, 60)},
+    '*': {'ip': (1200, 60), 'user': (600, 60)},
+}
+
+# blog.ratelimit.MemoryStore limits each worker process on its own; blog.ratelimit.CacheStore
+# shares the counts through BLOG_RATE_LIMIT_CACHE (memcached or Redis, not LocMem)
+
+BLOG_RATE_LIMIT_STORE = os.environ.get('BLOG_RATE_LIMIT_STORE', 'blog.ratelimit.MemoryStore')
+
+BLOG_RATE_LIMIT_CACHE = 'default'
+
+# The META key holding the client address: HTTP_X_REAL_IP (or similar) behind a proxy that sets it
+
+BLOG_RATE_LIMIT_IP_HEADER = os.environ.get('BLOG_RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+
+# Levels of replies (blog.threads): Comment.path holds 10 digits per level, 250 at most
+
+BLOG_COMMENT_MAX_DEPTH = 25
+
+# Write-behind comment ingestion (blog.ingest): the local SQLite journal comments are queued in
+# (202) before being bulk inserted; unset, each comment POST inserts its comment
+
+BLOG_COMMENT_QUEUE = os.environ.get('BLOG_COMMENT_QUEUE') or None
+
+BLOG_COMMENT_QUEUE_BATCH = 500
+
+# Seconds between flushes of the journal by the worker thread (None: no worker, flush with
+# manage.py flush_comments)
+
+BLOG_COMMENT_QUEUE_INTERVAL = 0.5
+
+# Articles with more comments than this are deleted in the background (202) by blog.deletion,
+# BLOG_PURGE_CHUNK_SIZE comments per transaction with a pause in between so other writers get
+# the write lock; None: always deleted by the request, in one transaction
+
+BLOG_PURGE_ASYNC_THRESHOLD = None
+
+BLOG_PURGE_CHUNK_SIZE = 5000
+
+BLOG_PURGE_CHUNK_PAUSE = 0.01
+
+# Response compression (blog.compression): encodings in order of preference (zstd and br only
+# when the zstandard / brotli packages are installed) and their levels
+
+BLOG_COMPRESSION_ENCODINGS = ('zstd', 'br', 'gzip')
+
+BLOG_COMPRESSION_LEVELS = {'zstd': 3, 'br': 5, 'gzip': 6}
+
+# Smaller bodies are sent as they are (streamed ones are always compressed)
+
+BLOG_COMPRESSION_MIN_SIZE = 1024
+
+BLOG_COMPRESSION_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+# Seconds a compressed body with an ETag is kept in BLOG_CACHE (keyed by encoding and body digest)
+
+BLOG_COMPRESSION_CACHE_TIMEOUT = 300
+
+# Per-request instrumentation (blog.profiling): Server-Timing headers, Prometheus
+# metrics at /metrics/ (not authenticated: keep it off the public network) and
+# cProfile dumps of a sample of slow requests
+
+BLOG_PROFILING = os.environ.get('BLOG_PROFILING') == '1'
+
+BLOG_PROFILING_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+BLOG_PROFILING_SAMPLE_RATE = float(os.environ.get('BLOG_PROFILING_SAMPLE_RATE', 0))
+
+BLOG_PROFILING_SLOW_MS = 500
+
+BLOG_PROFILING_DIR = os.environ.get('BLOG_PROFILING_DIR', str(BASE_DIR / 'profiles'))
+
+if BLOG_PROFILING:
+    MIDDLEWARE.insert(0, 'blog.profiling.ProfilingMiddleware')
@@ -13,10 +13,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from blog import profiling
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('blog.urls')),
+    path('api/', include('blog.async_urls' if settings.BLOG_ASYNC_VIEWS else 'blog.urls')),
 ]
+
+if settings.BLOG_PROFILING:
+    urlpatterns.append(path('metrics/', profiling.metrics, name='metrics'))